@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import page_cache
+from posts.models import Group, Post
+from posts.paginators import NEXT, encode_cursor
+
+User = get_user_model()
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='mobile')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание')
+        cls.other_group = Group.objects.create(
+            title='Другая группа', slug='api-other', description='Описание')
+        for i in range(5):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Пост {i}',
+                group=cls.group if i % 2 else None,
+            )
+        cls.post = Post.objects.latest('id')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_post_list_pages_by_cursor(self):
+        """Посты листаются курсором до конца ленты"""
+        url = reverse('api:post_list') + '?limit=2'
+        texts = []
+        while url:
+            data = self.client.get(url).json()
+            texts += [post['text'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(texts, [f'Пост {i}' for i in range(4, -1, -1)])
+
+    def test_sparse_fields_skip_joins(self):
+        """Без author и group запрос обходится без JOIN"""
+        # Состояние области для ETag считается раз на поколение
+        page_cache.get_scope_state(page_cache.index_scope())
+        with self.assertNumQueries(1):
+            data = self.client.get(
+                reverse('api:post_list'), {'fields': 'id,text'}).json()
+        self.assertEqual(
+            data['results'][0], {'id': self.post.pk, 'text': 'Пост 4'})
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('api:post_list'), {'fields': 'author,group'})
+        self.assertEqual(
+            response.json()['results'][1],
+            {'author': 'mobile', 'group': 'api'})
+
+    def test_group_and_author_posts(self):
+        """Посты группы и автора, 404 для неизвестных"""
+        data = self.client.get(
+            reverse('api:group_posts', args=['api'])).json()
+        self.assertEqual(len(data['results']), 2)
+        data = self.client.get(
+            reverse('api:author_posts', args=['mobile'])).json()
+        self.assertEqual(len(data['results']), 5)
+        for url in (
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:author_posts', args=['missing']),
+            reverse('api:post_detail', args=[self.post.pk + 100]),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_post_detail_cache_headers(self):
+        """Пост отдается с max-age и отвечает 304 по ETag"""
+        url = reverse('api:post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['author'], 'mobile')
+        self.assertIn('max-age=60', response['Cache-Control'])
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_group_list(self):
+        """Группы отдаются со счетчиком постов и листаются курсором"""
+        data = self.client.get(reverse('api:group_list'), {'limit': 1}).json()
+        self.assertEqual(data['results'][0]['slug'], 'api')
+        self.assertEqual(data['results'][0]['posts_count'], 2)
+        data = self.client.get(data['next']).json()
+        self.assertEqual(data['results'][0]['slug'], 'api-other')
+        self.assertEqual(data['results'][0]['posts_count'], 0)
+        self.assertIsNone(data['next'])
+
+    def test_group_list_bad_cursor_shows_first_page(self):
+        """Курсор с id вне диапазона базы или не числом — первая
+        страница, а не ошибка"""
+        url = reverse('api:group_list')
+        for key in (2 ** 63, -2 ** 70, 'x'):
+            with self.subTest(key=key):
+                response = self.client.get(
+                    url, {'cursor': encode_cursor(NEXT, key)})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    response.json()['results'][0]['slug'], 'api')
+
+    def test_bad_params(self):
+        """Неверные параметры и методы отклоняются"""
+        url = reverse('api:post_list')
+        for params in ({'fields': 'password'}, {'limit': 0}, {'limit': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
+        self.assertEqual(self.client.post(url).status_code, 405)
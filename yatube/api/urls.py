@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('groups/', views.group_list, name='group_list'),
+    path('groups/<slug>/posts/', views.group_posts, name='group_posts'),
+    path('authors/<str:username>/posts/', views.author_posts,
+         name='author_posts'),
+]
@@ -0,0 +1,200 @@
+"""Read-only JSON API для мобильных клиентов.
+
+Строки читаются через values_list(named=True), без сборки моделей,
+а JOIN к авторам и группам добавляется, только если клиент запросил
+эти поля в ?fields=. Ленты листаются тем же курсором (pub_date, id),
+что и HTML-страницы, и отдаются с ETag, Last-Modified и max-age
+от областей кэша страниц.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+
+from posts.models import Group, Post, User
+from posts.page_cache import (
+    conditional_page, group_scope, index_scope, post_scope, profile_scope)
+from posts.paginators import (
+    NEXT, KeysetPaginator, decode_cursor, encode_cursor, parse_pk)
+
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько секунд клиент может не перезапрашивать ответ
+API_MAX_AGE = 60
+# Поле ответа -> колонка values_list
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+}
+# Колонки ключа курсора читаются всегда
+KEY_COLUMNS = ('id', 'pub_date')
+GROUP_COLUMNS = ('id', 'slug', 'title', 'description', 'stats__posts_count')
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+class RowPaginator(KeysetPaginator):
+    """KeysetPaginator для строк values_list(named=True)."""
+
+    def make_cursor(self, direction, row):
+        return encode_cursor(direction, row.pub_date.isoformat(), row.id)
+
+
+def api_view(view_name=None, get_scope=None):
+    """Декоратор представления API: только GET и HEAD, ApiError
+    превращается в JSON-ответ, успешные ответы получают max-age.
+    С get_scope ответ еще и проверяется по ETag и Last-Modified."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                response = view(request, *args, **kwargs)
+            except ApiError as error:
+                return JsonResponse(
+                    {'detail': error.detail}, status=error.status)
+            patch_cache_control(response, max_age=API_MAX_AGE)
+            return response
+        if get_scope is not None:
+            wrapper = conditional_page(view_name, get_scope)(wrapper)
+        return require_safe(wrapper)
+    return decorator
+
+
+def get_fields(request):
+    fields = request.GET.get('fields')
+    if not fields:
+        return list(POST_FIELDS)
+    fields = fields.split(',')
+    unknown = set(fields) - POST_FIELDS.keys()
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}')
+    return fields
+
+
+def get_limit(request):
+    limit = request.GET.get('limit', API_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= API_MAX_PAGE_SIZE:
+        raise ApiError(f'limit должен быть от 1 до {API_MAX_PAGE_SIZE}')
+    return limit
+
+
+def get_columns(fields):
+    columns = list(KEY_COLUMNS)
+    columns += [
+        POST_FIELDS[field] for field in fields
+        if POST_FIELDS[field] not in columns
+    ]
+    return columns
+
+
+def serialize_post(row, fields):
+    return {field: getattr(row, POST_FIELDS[field]) for field in fields}
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri('?' + urlencode(params, doseq=True))
+
+
+def posts_response(request, posts):
+    fields = get_fields(request)
+    rows = posts.values_list(*get_columns(fields), named=True)
+    page = RowPaginator(rows, get_limit(request)).get_cursor_page(
+        request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize_post(row, fields) for row in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+def get_id_or_404(queryset, **lookup):
+    pk = queryset.filter(**lookup).values_list('id', flat=True).first()
+    if pk is None:
+        raise ApiError('Не найдено', status=404)
+    return pk
+
+
+@api_view('api:post_list', index_scope)
+def post_list(request):
+    return posts_response(request, Post.objects.all())
+
+
+@api_view('api:group_posts', group_scope)
+def group_posts(request, slug):
+    group_id = get_id_or_404(Group.objects.all(), slug=slug)
+    return posts_response(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view('api:author_posts', profile_scope)
+def author_posts(request, username):
+    author_id = get_id_or_404(User.objects.all(), username=username)
+    return posts_response(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view('api:post_detail', post_scope)
+def post_detail(request, post_id):
+    fields = get_fields(request)
+    row = Post.objects.filter(id=post_id).values_list(
+        *get_columns(fields), named=True).first()
+    if row is None:
+        raise ApiError('Не найдено', status=404)
+    return JsonResponse(serialize_post(row, fields))
+
+
+def parse_group_cursor(cursor):
+    """id последней группы из курсора; None для первой страницы,
+    в том числе для битого курсора и id вне диапазона базы."""
+    _, key = decode_cursor(cursor)
+    if not key or not isinstance(key[0], int):
+        return None
+    try:
+        return parse_pk(key[0])
+    except ValueError:
+        return None
+
+
+@api_view()
+def group_list(request):
+    """Группы по возрастанию id; курсор хранит id последней группы."""
+    limit = get_limit(request)
+    groups = Group.objects.order_by('id').values_list(*GROUP_COLUMNS)
+    last_id = parse_group_cursor(request.GET.get('cursor'))
+    if last_id is not None:
+        groups = groups.filter(id__gt=last_id)
+    rows = list(groups[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(NEXT, rows[-1][0])
+    return JsonResponse({
+        'results': [
+            {
+                'slug': slug,
+                'title': title,
+                'description': description,
+                'posts_count': posts_count or 0,
+            }
+            for _, slug, title, description, posts_count in rows
+        ],
+        'next': page_url(request, next_cursor),
+        'previous': None,
+    })
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Сигналы, которые сбрасывают пользователя из кэша
+        from . import auth  # noqa: F401
@@ -0,0 +1,89 @@
+"""Пользователь запроса из кэша.
+
+Стандартный AuthenticationMiddleware на каждый запрос читает
+auth_user по id из сессии. CachedAuthenticationMiddleware сначала
+смотрит в кэш и ходит в базу только при промахе. Вместе с
+SESSION_ENGINE = cached_db авторизованный запрос не делает ни
+одного запроса к базе до представления.
+
+Проверки те же, что в django.contrib.auth.get_user: бэкенд сессии
+должен быть в AUTHENTICATION_BACKENDS, а хеш сессии — совпадать
+с хешем пароля, иначе сессия сбрасывается. Любое сохранение или
+удаление пользователя (смена пароля, имени, is_active, is_staff)
+удаляет его из кэша сигналами ниже.
+
+Сигнал сбрасывает кэш только там, куда дотягивается процесс,
+обработавший изменение. Поэтому с кэшем своего у каждого процесса
+(LocMemCache) middleware работает как стандартный, а settings
+выбирают сессии в базе: иначе выход, смена пароля или блокировка
+в одном процессе до USER_CACHE_TIMEOUT не видны остальным.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+from posts import page_cache
+
+User = get_user_model()
+
+USER_CACHE_PREFIX = 'auth:user'
+USER_CACHE_TIMEOUT = 60 * 60
+
+
+def user_cache_key(user_id):
+    return f'{USER_CACHE_PREFIX}:{user_id}'
+
+
+def load_user(request):
+    """То же, что auth.get_user(request), но с кэшем."""
+    try:
+        user_id = auth._get_user_session_key(request)
+        backend_path = request.session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
+    session_hash = request.session.get(auth.HASH_SESSION_KEY)
+    if not (
+        session_hash
+        and constant_time_compare(
+            session_hash, user.get_session_auth_hash())
+    ):
+        # Пароль сменили в другой сессии
+        request.session.flush()
+        return AnonymousUser()
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = load_user(request)
+    return request._cached_user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        if page_cache.is_process_local():
+            return
+        request.user = SimpleLazyObject(lambda: get_user(request))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(user_cache_key(instance.pk))
@@ -0,0 +1,77 @@
+"""Backend SQLite, настроенный под конкурентную запись.
+
+Каждое новое соединение получает PRAGMA из PRAGMAS: WAL позволяет
+читателям не ждать писателя, synchronous=NORMAL в режиме WAL не
+теряет целостность и сильно ускоряет коммит, mmap и кэш страниц
+уменьшают число системных вызовов при чтении.
+
+Транзакции (transaction.atomic) начинаются с BEGIN IMMEDIATE под
+блокировкой процесса на файл базы. Обычный BEGIN откладывает захват
+записи до первого INSERT, и две транзакции, начавшие с чтения,
+упираются друг в друга: SQLite сразу отвечает "database is locked",
+не дожидаясь busy_timeout. С BEGIN IMMEDIATE писатели встают в
+очередь: потоки одного процесса — на блокировке, процессы — на
+busy_timeout. Соединения можно держать открытыми через CONN_MAX_AGE.
+"""
+import threading
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    # Отрицательное значение — размер в килобайтах
+    ('cache_size', -20000),
+    ('busy_timeout', 5000),
+)
+# Сколько секунд поток ждет очереди на запись
+WRITE_LOCK_TIMEOUT = 5
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def get_write_lock(name):
+    """Блокировка записи в файл базы name, одна на процесс."""
+    with _write_locks_guard:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _write_lock = None
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in PRAGMAS:
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        lock = get_write_lock(self.settings_dict['NAME'])
+        if not lock.acquire(timeout=WRITE_LOCK_TIMEOUT):
+            raise OperationalError('database is locked')
+        self._write_lock = lock
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._release_write_lock()
+            raise
+
+    def _set_autocommit(self, autocommit):
+        super()._set_autocommit(autocommit)
+        if autocommit:
+            # Внешний atomic завершился коммитом или откатом
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_write_lock()
+
+    def _release_write_lock(self):
+        if self._write_lock is not None:
+            self._write_lock.release()
+            self._write_lock = None
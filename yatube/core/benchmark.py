@@ -0,0 +1,199 @@
+"""Замер задержек всех страниц сайта на синтетических данных.
+
+Набор данных создается bulk_create-ом, затем каждый адрес из
+posts.urls, users.urls, about.urls и api.urls запрашивается тестовым клиентом
+анонимом и авторизованным пользователем. Для лент отдельно
+меряется страница из середины ленты. Результаты — перцентили
+задержки в миллисекундах и число SQL-запросов на страницу.
+
+Аноним меряется дважды: строка [anon] — без кэша страниц, чтобы
+в ней были видны регрессии представлений и запросов, а строка
+[anon cached] — с кэшем, после прогрева попадания в него.
+"""
+import math
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from about import urls as about_urls
+from api import urls as api_urls
+from posts import urls as posts_urls
+from posts.bulk import bulk_create_posts, refresh_derived_data
+from posts.models import Group, Post
+from posts.paginators import NEXT, KeysetPaginator
+from users import urls as users_urls
+
+User = get_user_model()
+
+URL_MODULES = (posts_urls, users_urls, about_urls, api_urls)
+FEED_QUERYSETS = {
+    'posts:index': lambda post: Post.objects.all(),
+    'posts:group_list': lambda post: Post.objects.filter(group=post.group),
+    'posts:profile': lambda post: Post.objects.filter(author=post.author),
+}
+PERCENTILES = (50, 95, 99)
+# Сравниваем с базовой линией медиану и p95: p99 на десятках
+# запросов почти совпадает с максимумом и слишком шумит
+COMPARED_METRICS = ('p50', 'p95')
+# Разница меньше этой считается шумом при любом пороге
+MIN_REGRESSION_MS = 1.0
+SEED_PREFIX = 'bench'
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def seed(posts, authors, groups, batch_size=5000):
+    """Создает авторов, группы и посты с датами по секунде друг от друга.
+    Каждый третий пост остается без группы."""
+    password = make_password(None)
+    User.objects.bulk_create(
+        (
+            User(
+                username=f'{SEED_PREFIX}{i}',
+                first_name='Автор',
+                last_name=str(i),
+                password=password,
+            )
+            for i in range(authors)
+        ),
+        batch_size=batch_size,
+    )
+    Group.objects.bulk_create(
+        (
+            Group(
+                title=f'Группа {i}',
+                slug=f'{SEED_PREFIX}-{i}',
+                description=f'Описание группы {i}',
+            )
+            for i in range(groups)
+        ),
+        batch_size=batch_size,
+    )
+    author_ids = list(User.objects.filter(
+        username__startswith=SEED_PREFIX).values_list('id', flat=True))
+    group_ids = list(Group.objects.filter(
+        slug__startswith=SEED_PREFIX).values_list('id', flat=True))
+    start = timezone.now() - timedelta(seconds=posts)
+    for batch_start in range(0, posts, batch_size):
+        batch_end = min(batch_start + batch_size, posts)
+        bulk_create_posts([
+            Post(
+                text=f'Тестовый пост номер {i}',
+                author_id=author_ids[i % len(author_ids)],
+                group_id=group_ids[i % len(group_ids)] if i % 3 else None,
+                pub_date=start + timedelta(seconds=i),
+            )
+            for i in range(batch_start, batch_end)
+        ])
+    refresh_derived_data()
+
+
+def get_scenarios():
+    """Возвращает [(название, url)] для всех страниц сайта."""
+    post = Post.objects.select_related('author', 'group').filter(
+        group__isnull=False).first()
+    sample_kwargs = {
+        'slug': post.group.slug,
+        'username': post.author.username,
+        'post_id': post.pk,
+    }
+    scenarios = []
+    for module in URL_MODULES:
+        for pattern in module.urlpatterns:
+            name = f'{module.app_name}:{pattern.name}'
+            kwargs = {
+                key: sample_kwargs[key] for key in pattern.pattern.converters
+            }
+            url = reverse(name, kwargs=kwargs)
+            scenarios.append((name, url))
+            if name in FEED_QUERYSETS:
+                scenarios.append(
+                    (f'{name} (deep)', url + get_deep_cursor(name, post)))
+    return scenarios, post.author
+
+
+def get_deep_cursor(name, post):
+    """Курсор на середину ленты."""
+    paginator = KeysetPaginator(FEED_QUERYSETS[name](post))
+    middle = paginator.object_list[paginator.object_list.count() // 2]
+    return '?cursor=' + paginator.make_cursor(NEXT, middle)
+
+
+def measure(client, url, requests, warmup, before_request=None):
+    timings = []
+    queries = []
+    for i in range(warmup + requests):
+        if before_request is not None:
+            before_request()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            elapsed = (time.perf_counter() - started) * 1000
+        if i >= warmup:
+            timings.append(elapsed)
+            queries.append(len(context))
+    result = {
+        f'p{percent}': round(percentile(timings, percent), 3)
+        for percent in PERCENTILES
+    }
+    result['queries'] = max(queries)
+    result['status'] = response.status_code
+    return result
+
+
+def run(scenarios, user, requests=20, warmup=2):
+    """Прогоняет сценарии анонимом и авторизованным пользователем."""
+    cache.clear()
+    results = {}
+    for name, url in scenarios:
+        with override_settings(PAGE_CACHE_TIMEOUT=0):
+            results[f'{name} [anon]'] = measure(
+                Client(), url, requests, warmup)
+        results[f'{name} [anon cached]'] = measure(
+            Client(), url, requests, warmup)
+        client = Client()
+        client.force_login(user)
+        before_request = None
+        if name == 'users:logout':
+            # Выход завершает сессию, логинимся перед каждым запросом
+            def before_request():
+                client.force_login(user)
+        results[f'{name} [auth]'] = measure(
+            client, url, requests, warmup, before_request)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Возвращает список регрессий относительно базовой линии."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            limit = max(
+                previous[metric] * (1 + threshold),
+                previous[metric] + MIN_REGRESSION_MS,
+            )
+            if current[metric] > limit:
+                regressions.append(
+                    f'{name}: {metric} {previous[metric]:.1f} -> '
+                    f'{current[metric]:.1f} мс')
+        if current['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: запросов {previous["queries"]} -> '
+                f'{current["queries"]}')
+    return regressions
@@ -0,0 +1,92 @@
+"""Чтение лент с реплик базы данных.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. С реплики читают
+только представления, обернутые use_replica: ленты и страницы
+постов. Сессии, пользователь из middleware и все записи идут
+в основную базу: пользователь загружается до переключения на
+реплику, а сессии роутер всегда читает с default. Тот, кто только
+что создал или отредактировал пост (представление обернуто
+pin_primary), еще REPLICA_PIN_SECONDS читает с основной базы
+и сразу видит свою запись, даже если реплика отстает.
+
+Ответ, прочитанный с реплики, может отставать от поколения кэша
+страниц, которое запись уже сменила. Поэтому такие ответы
+(read_from_replica) не кладутся в кэш страниц и не получают
+ETag и Last-Modified: иначе устаревшая страница жила бы под свежим
+поколением до его истечения.
+"""
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+# Приложения, которые всегда читают с основной базы: свежая сессия
+# только что вошедшего пользователя может еще не дойти до реплики
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def get_replica():
+    """Алиас реплики текущего запроса или None."""
+    return getattr(_state, 'replica', None)
+
+
+def read_from_replica(request):
+    """True, если представление читало данные запроса с реплики."""
+    return getattr(request, '_replica', None) is not None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return get_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все базы в DATABASES — копии одной схемы и одних данных
+        return True
+
+
+def use_replica(view):
+    """Декоратор представления: GET-запрос читает с одной из реплик,
+    если они настроены и пользователь не закреплен за основной базой."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or request.method not in ('GET', 'HEAD')
+            or PIN_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        # request.user ленивый: без этого его прочитали бы с реплики
+        # при рендеринге шаблона
+        request.user.is_authenticated
+        # Одна реплика на весь запрос, чтобы данные были согласованы
+        _state.replica = request._replica = random.choice(replicas)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.replica = None
+    return wrapper
+
+
+def pin_primary(view):
+    """Декоратор пишущего представления: после POST закрепляет
+    пользователя за основной базой на REPLICA_PIN_SECONDS."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == 'POST' and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+    return wrapper
@@ -0,0 +1,79 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import benchmark
+
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Заполняет тестовую базу синтетическими данными, замеряет '
+            'задержки и число запросов всех страниц и сравнивает их '
+            'с базовой линией.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=20000,
+                            help='Число постов, например 1000000.')
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Замеров на каждую страницу.')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Прогревочных запросов перед замерами.')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Допустимый рост задержки, доля.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Записать результаты как базовую линию.')
+
+    def handle(self, *args, **options):
+        dataset = {
+            key: options[key] for key in ('posts', 'authors', 'groups')
+        }
+        if min(dataset.values()) < 1:
+            raise CommandError('Нужен хотя бы один пост, автор и группа.')
+        # Замеры идут на отдельной тестовой базе, рабочая не трогается
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f'Заполняем базу: {dataset}')
+            benchmark.seed(**dataset)
+            scenarios, user = benchmark.get_scenarios()
+            results = benchmark.run(
+                scenarios, user, options['requests'], options['warmup'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<40} p50 {result["p50"]:>8.2f} '
+                f'p95 {result["p95"]:>8.2f} p99 {result["p99"]:>8.2f} мс '
+                f'запросов {result["queries"]:>3} код {result["status"]}')
+        report = {'dataset': dataset, 'results': results}
+        if options['save_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовая линия записана в {options["baseline"]}'))
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                'Базовой линии нет, запустите с --save-baseline'))
+            return
+        with open(options['baseline'], encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['dataset'] != dataset:
+            raise CommandError(
+                f'Базовая линия снята на других данных: {baseline["dataset"]}')
+        regressions = benchmark.compare(
+            results, baseline['results'], options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Регрессии производительности:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
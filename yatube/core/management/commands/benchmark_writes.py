@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import write_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает конкурентную запись в SQLite стандартным '
+            'backend и core.backends.sqlite3 на временных файлах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=100,
+                            help='Транзакций на поток.')
+
+    def handle(self, *args, **options):
+        if min(options['threads'], options['writes']) < 1:
+            raise CommandError('Нужен хотя бы один поток и одна запись.')
+        results = {}
+        for name in write_benchmark.ENGINES:
+            results[name] = result = write_benchmark.run(
+                name, options['threads'], options['writes'])
+            self.stdout.write(
+                f'{name:<6} записей {result["writes"]:>6} '
+                f'ошибок {result["errors"]:>6} '
+                f'{result["writes_per_second"]:>7} в секунду')
+        stock = results['stock']['writes_per_second']
+        if stock:
+            gain = results['tuned']['writes_per_second'] / stock
+            self.stdout.write(self.style.SUCCESS(
+                f'Ускорение: {gain:.1f}x'))
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.slow_queries import get_report, read_log
+
+
+class Command(BaseCommand):
+    help = ('Показывает самые затратные медленные запросы из журнала '
+            'SLOW_QUERY_LOG, сгруппированные по отпечатку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top', type=int, default=10,
+            help='Сколько отпечатков показать.')
+        parser.add_argument(
+            '--view', help='Только запросы этого представления.')
+        parser.add_argument(
+            '--log', default=None,
+            help='Журнал; по умолчанию SLOW_QUERY_LOG.')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        try:
+            report = get_report(read_log(path), options['view'])
+        except FileNotFoundError:
+            raise CommandError(f'Нет журнала {path}.')
+        if not report:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        for row in report[:options['top']]:
+            self.stdout.write(self.style.WARNING(
+                f'{row["fingerprint"]}  count {row["count"]}  '
+                f'total {row["total_ms"]:.1f} ms  '
+                f'max {row["max_ms"]:.1f} ms'))
+            self.stdout.write(f'    {row["normalized"]}')
+            self.stdout.write(
+                '    views: ' + ', '.join(sorted(row['views'])))
+            if row['templates']:
+                self.stdout.write(
+                    '    templates: ' + ', '.join(sorted(row['templates'])))
+            for line in row['plan'] or ():
+                self.stdout.write(f'    plan: {line}')
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из '
+            'DATABASE_REPLICAS. Заменяет репликацию для локальных '
+            'файлов-заглушек.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Какие реплики обновить; по умолчанию все.')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite.')
+        primary.ensure_connection()
+        for alias in aliases:
+            if alias not in connections.databases:
+                raise CommandError(f'Нет базы {alias} в DATABASES.')
+            replica = connections[alias]
+            replica.ensure_connection()
+            primary.connection.backup(replica.connection)
+            self.stdout.write(self.style.SUCCESS(f'{alias}: скопирована'))
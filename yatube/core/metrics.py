@@ -0,0 +1,230 @@
+"""Метрики запросов в формате Prometheus.
+
+MetricsMiddleware для каждого запроса замеряет общее время, время
+и число SQL-запросов (через execute_wrapper, без DEBUG), время
+рендеринга шаблонов и размер ответа и раскладывает их по корзинам
+гистограмм под именем представления, например posts:index.
+
+Запрос только увеличивает счетчики в памяти процесса. Раз в
+METRICS_FLUSH_INTERVAL секунд накопленные приращения переносятся
+в общий кэш через incr, где их складывают все процессы сервера;
+/metrics читает сумму оттуда. Поэтому в ответе одни и те же цифры,
+какой бы процесс ни обработал запрос Prometheus, — при условии,
+что кэш общий (memcached, redis), а не LocMemCache.
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import (
+    DjangoTemplates, Template, reraise)
+
+METRICS_PREFIX = 'metrics'
+UNRESOLVED = 'unresolved'
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Метрика -> (верхние границы корзин, множитель для целых в кэше, HELP)
+METRICS = {
+    'request_seconds': (
+        TIME_BUCKETS, 10 ** 6, 'Время обработки запроса'),
+    'sql_seconds': (
+        TIME_BUCKETS, 10 ** 6, 'Время SQL-запросов за запрос'),
+    'sql_queries': (
+        (0, 1, 2, 3, 5, 10, 20, 50, 100), 1, 'Число SQL-запросов за запрос'),
+    'template_seconds': (
+        TIME_BUCKETS, 10 ** 6, 'Время рендеринга шаблонов'),
+    'response_bytes': (
+        (1000, 5000, 10000, 25000, 50000, 100000, 250000, 1000000), 1,
+        'Размер тела ответа'),
+}
+SUM = 'sum'
+
+_local = threading.local()
+
+
+def _views_key():
+    return f'{METRICS_PREFIX}:views'
+
+
+def _metric_key(view_name, metric, part):
+    return f'{METRICS_PREFIX}:{view_name}:{metric}:{part}'
+
+
+def _increment(key, delta):
+    if cache.add(key, delta, None):
+        return
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        cache.add(key, delta, None)
+
+
+class RequestMetrics:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.sql_seconds = 0
+        self.sql_queries = 0
+        self.template_seconds = 0
+        self.rendering = False
+
+    def time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.sql_queries += 1
+
+
+class Registry:
+    """Приращения гистограмм процесса, еще не перенесенные в кэш."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.views = set()
+        self.flushed_at = time.monotonic()
+
+    def observe(self, view_name, values):
+        with self.lock:
+            self.views.add(view_name)
+            for metric, value in values.items():
+                buckets, scale, _ = METRICS[metric]
+                index = bisect.bisect_left(buckets, value)
+                self.pending[view_name, metric, index] += 1
+                self.pending[view_name, metric, SUM] += round(value * scale)
+            due = (
+                time.monotonic() - self.flushed_at
+                >= settings.METRICS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            views = set(self.views)
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return
+        known = cache.get(_views_key(), set())
+        if not views <= known:
+            cache.set(_views_key(), known | views, None)
+        for (view_name, metric, part), delta in pending.items():
+            _increment(_metric_key(view_name, metric, part), delta)
+
+
+registry = Registry()
+
+
+def render():
+    """Все гистограммы в текстовом формате Prometheus."""
+    registry.flush()
+    views = sorted(cache.get(_views_key(), set()))
+    keys = {
+        (view_name, metric, part): _metric_key(view_name, metric, part)
+        for view_name in views
+        for metric, (buckets, _, _) in METRICS.items()
+        for part in [*range(len(buckets) + 1), SUM]
+    }
+    values = cache.get_many(keys.values())
+    lines = []
+    for metric, (buckets, scale, help_text) in METRICS.items():
+        name = f'yatube_{metric}'
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view_name in views:
+            label = f'view="{view_name}"'
+            count = 0
+            for index, bound in enumerate([*buckets, '+Inf']):
+                count += values.get(keys[view_name, metric, index], 0)
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+            total = values.get(keys[view_name, metric, SUM], 0) / scale
+            lines.append(f'{name}_sum{{{label}}} {total}')
+            lines.append(f'{name}_count{{{label}}} {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    keys = [
+        _metric_key(view_name, metric, part)
+        for view_name in cache.get(_views_key(), set())
+        for metric, (buckets, _, _) in METRICS.items()
+        for part in [*range(len(buckets) + 1), SUM]
+    ]
+    cache.delete_many([_views_key(), *keys])
+    with registry.lock:
+        registry.pending.clear()
+        registry.views.clear()
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и отдает замеры в registry."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        current = _local.current = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(current.time_query))
+                response = self.get_response(request)
+        finally:
+            _local.current = None
+        values = {
+            'request_seconds': time.perf_counter() - started,
+            'sql_seconds': current.sql_seconds,
+            'sql_queries': current.sql_queries,
+            'template_seconds': current.template_seconds,
+        }
+        # Размер потокового ответа неизвестен, пока его не отдали
+        if not response.streaming:
+            values['response_bytes'] = len(response.content)
+        match = request.resolver_match
+        registry.observe(match.view_name if match else UNRESOLVED, values)
+        return response
+
+
+class TimedTemplate(Template):
+    """Шаблон, который добавляет время рендеринга к замерам запроса.
+    Вложенный рендеринг (render_to_string из тега) уже входит
+    во внешний и отдельно не считается."""
+
+    def render(self, context=None, request=None):
+        current = getattr(_local, 'current', None)
+        if current is None or current.rendering:
+            return super().render(context, request)
+        current.rendering = True
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            current.template_seconds += time.perf_counter() - started
+            current.rendering = False
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Шаблонизатор Django, шаблоны которого замеряют рендеринг."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,71 @@
+"""Бюджеты SQL-запросов для представлений.
+
+count_queries() считает запросы через execute_wrapper, не сохраняя
+их текст, поэтому работает и без DEBUG. query_budget(limit) — то же
+самое, но падает с QueryBudgetExceeded при превышении лимита;
+его можно использовать и как декоратор. Бюджеты страниц по имени
+URL лежат в settings.QUERY_BUDGETS.
+"""
+from contextlib import ContextDecorator
+
+from django.conf import settings
+from django.db import connection
+
+# С общим для процессов кэшем сессия и пользователь приходят из кэша
+# (SESSION_ENGINE = cached_db и core.auth.CachedAuthenticationMiddleware),
+# к базе они не ходят
+AUTHENTICATED_QUERIES = 0
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class count_queries(ContextDecorator):
+    """Контекстный менеджер, который считает выполненные запросы."""
+
+    def __init__(self, using=connection):
+        self.connection = using
+        self.count = 0
+        self.statements = []
+
+    def _wrap(self, execute, sql, params, many, context):
+        self.count += 1
+        if len(self.statements) < 20:
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.count = 0
+        self.statements = []
+        self._wrapper = self.connection.execute_wrapper(self._wrap)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+        return False
+
+
+class query_budget(count_queries):
+    """Падает, если внутри блока выполнено больше limit запросов."""
+
+    def __init__(self, limit, using=connection):
+        super().__init__(using)
+        self.limit = limit
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and self.count > self.limit:
+            raise QueryBudgetExceeded(
+                f'Выполнено {self.count} запросов при бюджете {self.limit}:\n'
+                + '\n'.join(self.statements))
+        return False
+
+
+def get_budget(view_name, authenticated=False):
+    """Бюджет страницы по имени URL, например 'posts:index'."""
+    budget = settings.QUERY_BUDGETS[view_name]
+    if authenticated:
+        budget += AUTHENTICATED_QUERIES
+    return budget
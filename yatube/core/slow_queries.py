@@ -0,0 +1,217 @@
+"""Журнал медленных SQL-запросов.
+
+SlowQueryMiddleware ставит на все соединения execute_wrapper,
+который засекает каждый запрос. Запрос дольше SLOW_QUERY_THRESHOLD
+секунд дописывается строкой JSON в SLOW_QUERY_LOG: представление,
+шаблон и строка в нем, если запрос выполнил ленивый queryset при
+рендеринге, строка кода проекта, отпечаток и план запроса.
+
+План снимается сразу, тем же соединением и с теми же параметрами,
+поэтому он показывает, что видела база в момент медленного запроса.
+Параметры в журнал не пишутся: в них бывают пароли и личные данные.
+Быстрые запросы стоят один вызов perf_counter, стек и план
+разбираются только у медленных.
+
+Отпечаток — текст запроса без литералов и с одним плейсхолдером
+вместо списка в IN, так что запросы, различающиеся только
+значениями, складываются в одну строку отчета slow_queries.
+
+Журнал пишется прямо в обертке execute, поэтому ошибка записи
+(нет места, каталог только для чтения, неверный SLOW_QUERY_LOG)
+уходит в logging, а не в ответ и не подменяет ошибку самого запроса.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+from . import metrics, query_budget
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FINGERPRINT_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(\s*,\s*\?)*\s*\)'), '(?+)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+# Обертки execute, через которые проходит любой запрос
+WRAPPER_FILES = {
+    os.path.abspath(path)
+    for path in (__file__, metrics.__file__, query_budget.__file__)
+}
+
+_write_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(sql):
+    """Возвращает (нормализованный текст, короткий хеш)."""
+    normalized = sql
+    for pattern, replacement in FINGERPRINT_PATTERNS:
+        normalized = pattern.sub(replacement, normalized)
+    normalized = normalized.strip()
+    return normalized, hashlib.md5(normalized.encode()).hexdigest()[:12]
+
+
+def explain(connection, sql, params):
+    """План запроса или None, если его не получить. Курсор
+    берется мимо execute_wrapper, чтобы не замерять сам EXPLAIN."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix()} {sql}', params)
+        return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+    finally:
+        cursor.close()
+
+
+def get_origin():
+    """Возвращает (шаблон:строка, файл:строка) места, откуда пришел
+    запрос: ближайший узел шаблона и ближайший кадр кода проекта."""
+    template = source = None
+    frame = sys._getframe(1)
+    while frame is not None and not (template and source):
+        code = frame.f_code
+        node = frame.f_locals.get('self')
+        if (
+            template is None
+            and code.co_name == 'render_annotated'
+            and getattr(node, 'origin', None) is not None
+        ):
+            name = node.origin.template_name or node.origin.name
+            template = f'{name}:{node.token.lineno}'
+        elif (
+            source is None
+            and code.co_filename.startswith(PROJECT_DIR)
+            and 'site-packages' not in code.co_filename
+            and code.co_filename not in WRAPPER_FILES
+        ):
+            path = os.path.relpath(code.co_filename, PROJECT_DIR)
+            source = f'{path}:{frame.f_lineno}'
+        frame = frame.f_back
+    return template, source
+
+
+def write_entry(entry):
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    try:
+        with _write_lock:
+            with open(
+                    settings.SLOW_QUERY_LOG, 'a', encoding='utf-8') as file:
+                file.write(line)
+    except OSError as error:
+        logger.warning(
+            'Не удалось записать медленный запрос в %s: %s',
+            settings.SLOW_QUERY_LOG, error)
+
+
+class SlowQueryLogger:
+    """execute_wrapper, который пишет в журнал медленные запросы
+    одного HTTP-запроса."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def get_view_name(self):
+        match = self.request.resolver_match
+        return match.view_name if match else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self.log(sql, params, many, context, duration)
+
+    def log(self, sql, params, many, context, duration):
+        connection = context['connection']
+        template, source = get_origin()
+        normalized, digest = fingerprint(sql)
+        write_entry({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'view': self.get_view_name(),
+            'path': self.request.path,
+            'template': template,
+            'source': source,
+            'fingerprint': digest,
+            'normalized': normalized,
+            'sql': sql,
+            'plan': None if many else explain(connection, sql, params),
+        })
+
+
+class SlowQueryMiddleware:
+    """Включает SlowQueryLogger на время запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        threshold = settings.SLOW_QUERY_THRESHOLD
+        if threshold is None:
+            return self.get_response(request)
+        logger = SlowQueryLogger(request, threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(logger))
+            return self.get_response(request)
+
+
+def read_log(path=None):
+    """Записи журнала; битые строки (например, недописанные при
+    падении процесса) пропускаются."""
+    with open(path or settings.SLOW_QUERY_LOG, encoding='utf-8') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def get_report(entries, view_name=None):
+    """Сводка по отпечаткам, от самых затратных по сумме времени."""
+    report = {}
+    for entry in entries:
+        if view_name and entry['view'] != view_name:
+            continue
+        row = report.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'],
+            'normalized': entry['normalized'],
+            'count': 0,
+            'total_ms': 0,
+            'max_ms': 0,
+            'views': set(),
+            'templates': set(),
+            'plan': None,
+        })
+        row['count'] += 1
+        row['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= row['max_ms']:
+            row['max_ms'] = entry['duration_ms']
+            row['plan'] = entry['plan']
+        row['views'].add(entry['view'] or '-')
+        if entry['template']:
+            row['templates'].add(entry['template'])
+    return sorted(
+        report.values(), key=lambda row: row['total_ms'], reverse=True)
@@ -0,0 +1,170 @@
+"""Статика с хешами в именах и заранее сжатыми копиями.
+
+collectstatic с CompressedManifestStaticFilesStorage копирует файлы
+из STATICFILES_DIRS в STATIC_ROOT под именами с хешем содержимого
+(css/bootstrap.min.1a2b3c4d5e6f.css), пишет manifest исходное имя ->
+имя с хешем и рядом с каждым текстовым файлом кладет его .gz.
+Тег {% static %} берет имена из manifest.
+
+PrecompressedStaticFiles — WSGI-обертка, которая сама отдает файлы
+из STATIC_ROOT: .gz-копию, если клиент принимает gzip, и для имен
+с хешем Cache-Control на год с immutable. Содержимое такого файла
+не меняется никогда: новая версия получает новое имя, поэтому
+повторный визит не делает за статикой ни одного запроса.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+from email.utils import formatdate, parsedate_to_datetime
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import (
+    ManifestStaticFilesStorage, staticfiles_storage)
+from django.core.files.base import ContentFile
+from django.utils.functional import cached_property
+
+# Сжимать имеет смысл только текст; картинки уже сжаты
+GZIP_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.json', '.xml', '.ico')
+# Меньше этого размера gzip не окупает заголовки
+GZIP_MIN_SIZE = 256
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Файлы без хеша в имени могут поменяться на месте
+MUTABLE_CACHE_CONTROL = 'public, max-age=60'
+CHUNK_SIZE = 64 * 1024
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, который после collectstatic
+    сохраняет .gz-копии текстовых файлов."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.manifest_strict = settings.STATICFILES_MANIFEST_STRICT
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Без manifest имена остались бы без хеша, а отдаются
+            # такие файлы с коротким кэшем, который не сбросить
+            if self.manifest_strict:
+                raise ValueError(
+                    f'Нет {self.manifest_name} в STATIC_ROOT: '
+                    f'запустите collectstatic')
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+                paths, dry_run, **options):
+            if (
+                not dry_run
+                and isinstance(hashed_name, str)
+                and hashed_name.endswith(GZIP_EXTENSIONS)
+            ):
+                self.compress(name)
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        """Сохраняет name.gz, если сжатие заметно уменьшает файл."""
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < GZIP_MIN_SIZE:
+            return
+        # mtime=0: одинаковый вход дает одинаковый .gz
+        compressed = gzip.compress(content, compresslevel=9, mtime=0)
+        if len(compressed) >= len(content) * 0.95:
+            return
+        if self.exists(name + '.gz'):
+            self.delete(name + '.gz')
+        self._save(name + '.gz', ContentFile(compressed))
+
+
+def read_file(filename):
+    with open(filename, 'rb') as file:
+        yield from iter(lambda: file.read(CHUNK_SIZE), b'')
+
+
+def accepts_gzip(environ):
+    """Принимает ли клиент gzip: явно или через *, с q больше нуля
+    (gzip;q=0 — отказ)."""
+    qualities = {}
+    for item in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0)) > 0
+
+
+def not_modified_since(environ, mtime):
+    header = environ.get('HTTP_IF_MODIFIED_SINCE')
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(mtime) <= since
+
+
+class PrecompressedStaticFiles:
+    """WSGI-обертка, которая отдает STATIC_ROOT до Django."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = os.path.realpath(root or settings.STATIC_ROOT)
+        self.prefix = prefix or settings.STATIC_URL
+
+    @cached_property
+    def hashed_names(self):
+        """Имена с хешем из manifest: их содержимое не меняется."""
+        return set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if (
+            environ.get('REQUEST_METHOD') in ('GET', 'HEAD')
+            and path.startswith(self.prefix)
+        ):
+            name = posixpath.normpath(path[len(self.prefix):]).lstrip('/')
+            filename = os.path.realpath(os.path.join(self.root, name))
+            if (
+                filename.startswith(self.root + os.sep)
+                and os.path.isfile(filename)
+            ):
+                return self.serve(environ, start_response, name, filename)
+        return self.application(environ, start_response)
+
+    def serve(self, environ, start_response, name, filename):
+        content_type, _ = mimetypes.guess_type(filename)
+        headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Vary', 'Accept-Encoding'),
+            ('Cache-Control', IMMUTABLE_CACHE_CONTROL
+             if name in self.hashed_names else MUTABLE_CACHE_CONTROL),
+        ]
+        if accepts_gzip(environ) and os.path.isfile(filename + '.gz'):
+            filename += '.gz'
+            headers.append(('Content-Encoding', 'gzip'))
+        stat = os.stat(filename)
+        headers.append(
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)))
+        if not_modified_since(environ, stat.st_mtime):
+            start_response('304 Not Modified', headers)
+            return []
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            # Сервер сам закроет файл и может отдать его через sendfile
+            return file_wrapper(open(filename, 'rb'), CHUNK_SIZE)
+        return read_file(filename)
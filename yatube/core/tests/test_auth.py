@@ -0,0 +1,99 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.auth import user_cache_key
+
+User = get_user_model()
+
+CACHE_DIR = tempfile.mkdtemp()
+# Пользователь и сессия кэшируются только в общем для процессов кэше
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+}
+
+
+@override_settings(
+    CACHES=SHARED_CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class CachedUserTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='cached', first_name='Старое', password='old-secret')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.login(username='cached', password='old-secret')
+        self.url = reverse('about:author')
+
+    def get_user(self):
+        return self.client.get(self.url).context['user']
+
+    def test_no_queries_after_first_request(self):
+        """Сессия и пользователь читаются из кэша, а не из базы"""
+        self.assertEqual(self.get_user(), self.user)
+        with self.assertNumQueries(0):
+            user = self.get_user()
+        self.assertTrue(user.is_authenticated)
+
+    def test_profile_change_is_visible(self):
+        """Правка пользователя сбрасывает его из кэша"""
+        self.get_user()
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Новое'
+        user.save()
+        self.assertEqual(self.get_user().first_name, 'Новое')
+        user.is_active = False
+        user.save()
+        self.assertFalse(self.get_user().is_authenticated)
+
+    def test_password_change_ends_other_sessions(self):
+        """После смены пароля старая сессия становится анонимной"""
+        self.get_user()
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-secret')
+        user.save()
+        self.assertFalse(self.get_user().is_authenticated)
+
+    def test_cached_user_is_checked_against_session(self):
+        """Хеш сессии сверяется и для пользователя из кэша"""
+        self.get_user()
+        user = User.objects.get(pk=self.user.pk)
+        user.password = 'changed elsewhere'
+        cache.set(user_cache_key(user.pk), user)
+        self.assertFalse(self.get_user().is_authenticated)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class ProcessLocalCacheTest(TestCase):
+    def test_locmem_cache_is_not_trusted(self):
+        """С LocMemCache сессии и пользователь читаются из базы:
+        кэш другого процесса не отдаст заблокированного пользователя"""
+        self.assertEqual(
+            settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+        user = User.objects.create_user(username='local', password='secret')
+        client = Client()
+        client.login(username='local', password='secret')
+        url = reverse('about:author')
+        self.assertTrue(client.get(url).context['user'].is_authenticated)
+        # Как будто другой процесс закэшировал пользователя, а этот
+        # заблокировал его без сигнала в наш кэш
+        cache.set(user_cache_key(user.pk), user)
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        self.assertFalse(client.get(url).context['user'].is_authenticated)
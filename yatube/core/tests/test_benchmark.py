@@ -0,0 +1,44 @@
+from django.test import TestCase
+
+from core import benchmark
+
+
+class BenchmarkTest(TestCase):
+    def test_all_pages_measured(self):
+        """Каждая страница сайта отвечает без ошибок и попадает в отчет"""
+        benchmark.seed(posts=30, authors=3, groups=2)
+        scenarios, user = benchmark.get_scenarios()
+        results = benchmark.run(scenarios, user, requests=1, warmup=0)
+        self.assertIn('posts:index (deep) [anon]', results)
+        self.assertIn('about:tech [auth]', results)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertLess(result['status'], 400)
+
+    def test_anonymous_rows_bypass_page_cache(self):
+        """Строка [anon] меряет представление, а не попадание в кэш
+        страниц; попадание меряется отдельной строкой"""
+        benchmark.seed(posts=30, authors=3, groups=2)
+        scenarios, user = benchmark.get_scenarios()
+        index = [(name, url) for name, url in scenarios
+                 if name == 'posts:index']
+        results = benchmark.run(index, user, requests=2, warmup=1)
+        self.assertGreater(results['posts:index [anon]']['queries'], 0)
+        self.assertEqual(results['posts:index [anon cached]']['queries'], 0)
+
+    def test_compare_finds_regressions(self):
+        """Рост задержки сверх порога и рост числа запросов — регрессии"""
+        baseline = {'page': {'p50': 10.0, 'p95': 20.0, 'queries': 3}}
+        self.assertEqual(benchmark.compare(
+            {'page': {'p50': 11.0, 'p95': 21.0, 'queries': 3}},
+            baseline, 0.25), [])
+        regressions = benchmark.compare(
+            {'page': {'p50': 10.0, 'p95': 30.0, 'queries': 4}},
+            baseline, 0.25)
+        self.assertEqual(len(regressions), 2)
+
+    def test_percentile(self):
+        """Перцентиль считается по ближайшему рангу"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
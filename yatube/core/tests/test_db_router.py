@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import router
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db_router import PIN_COOKIE, use_replica
+from posts.models import Post
+from posts.timeline import TIMELINE_KEY
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_TIMEOUT=0)
+class ReplicaRoutingTest(TransactionTestCase):
+    """default и replica — две разные базы SQLite, поэтому по
+    содержимому ответа видно, откуда его прочитали."""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.post = Post.objects.create(author=self.author, text='Старый')
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+
+    def test_feed_reads_from_replica(self):
+        """Страницы постов читаются с реплики"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
+        self.sync()
+        self.assertEqual(self.guest_client.get(url).status_code, 200)
+        self.assertEqual(
+            Post.objects.using('replica').get(pk=self.post.pk).text, 'Старый')
+
+    def test_author_is_pinned_after_edit(self):
+        """После правки автор читает с основной базы, остальные —
+        с отстающей реплики"""
+        self.sync()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый'},
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertContains(self.author_client.get(url), 'Новый')
+        self.assertContains(self.guest_client.get(url), 'Старый')
+
+    def test_reads_outside_feeds_use_primary(self):
+        """Вне лент и записи, и чтения идут в default"""
+        self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).text, 'Старый')
+
+    def test_user_and_session_use_primary(self):
+        """Пользователь и сессия читаются с основной базы, даже если
+        реплика о них еще не знает"""
+        response = self.author_client.get(
+            reverse('posts:search'), {'q': 'Старый'})
+        self.assertTrue(response.context['user'].is_authenticated)
+
+        @use_replica
+        def view(request):
+            return router.db_for_read(Session), router.db_for_read(Post)
+
+        request = response.wsgi_request
+        self.assertEqual(view(request), ('default', 'replica'))
+
+    def test_replica_lag_keeps_timeline(self):
+        """Пост, которого еще нет на реплике, не сбрасывает буфер
+        главной: страница просто читается из базы"""
+        self.sync()
+        Post.objects.create(author=self.author, text='Свежий')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Старый'])
+        self.assertIsNotNone(cache.get(TIMELINE_KEY))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PAGE_CACHE_TIMEOUT=600)
+class ReplicaPageCacheTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        Post.objects.create(author=self.author, text='Старый')
+        call_command('sync_replicas', stdout=StringIO())
+        self.client = Client()
+
+    def test_replica_pages_are_not_cached(self):
+        """Страница с отстающей реплики не попадает в кэш под свежим
+        поколением и не получает ETag"""
+        Post.objects.create(author=self.author, text='Свежий')
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Свежий')
+        self.assertFalse(response.has_header('ETag'))
+        call_command('sync_replicas', stdout=StringIO())
+        self.assertContains(self.client.get(url), 'Свежий')
@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+def get_sample(text, name, view_name, suffix='count'):
+    match = re.search(
+        rf'^{name}_{suffix}\{{view="{view_name}"\}} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+@override_settings(METRICS_FLUSH_INTERVAL=0, PAGE_CACHE_TIMEOUT=0)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def get_metrics(self):
+        response = self.staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_is_measured_by_view_name(self):
+        """Запрос попадает в гистограммы под именем представления"""
+        response = Client().get(reverse('posts:index'))
+        text = self.get_metrics()
+        for name in metrics.METRICS:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    get_sample(text, f'yatube_{name}', 'posts:index'), 1)
+        self.assertEqual(
+            get_sample(
+                text, 'yatube_response_bytes', 'posts:index', 'sum'),
+            len(response.content))
+        self.assertGreater(
+            get_sample(text, 'yatube_sql_queries', 'posts:index', 'sum'), 0)
+        self.assertGreater(
+            get_sample(
+                text, 'yatube_template_seconds', 'posts:index', 'sum'), 0)
+
+    def test_buckets_are_cumulative(self):
+        """Корзины накопительные, +Inf равна числу запросов"""
+        metrics.registry.observe('posts:index', {'sql_queries': 1})
+        metrics.registry.observe('posts:index', {'sql_queries': 30})
+        text = self.get_metrics()
+        label = 'yatube_sql_queries_bucket{view="posts:index",le="%s"} %d'
+        self.assertIn(label % ('0', 0), text)
+        self.assertIn(label % ('1', 1), text)
+        self.assertIn(label % ('20', 1), text)
+        self.assertIn(label % ('50', 2), text)
+        self.assertIn(label % ('+Inf', 2), text)
+
+    @override_settings(METRICS_FLUSH_INTERVAL=3600)
+    def test_observations_wait_for_flush(self):
+        """Замеры копятся в процессе и попадают в кэш при выгрузке"""
+        metrics.registry.flush()
+        metrics.registry.observe('posts:index', {'sql_queries': 1})
+        self.assertIsNone(cache.get(metrics._views_key()))
+        metrics.registry.flush()
+        self.assertEqual(cache.get(metrics._views_key()), {'posts:index'})
+
+    def test_unresolved_requests(self):
+        """Запрос к несуществующему адресу считается отдельно"""
+        Client().get('/no/such/page/')
+        self.assertEqual(
+            get_sample(
+                self.get_metrics(), 'yatube_request_seconds',
+                metrics.UNRESOLVED),
+            1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_access(self):
+        """/metrics закрыт для анонимов и открыт по токену"""
+        url = reverse('metrics')
+        author_client = Client()
+        author_client.force_login(self.author)
+        self.assertEqual(Client().get(url).status_code, 302)
+        self.assertEqual(author_client.get(url).status_code, 302)
+        response = Client().get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        response = Client().get(url, HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.template import engines
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.slow_queries import SlowQueryLogger, fingerprint, read_log
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.log = os.path.join(directory.name, 'slow.jsonl')
+        settings = override_settings(
+            SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=self.log,
+            PAGE_CACHE_TIMEOUT=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_fingerprint(self):
+        """Запросы, различающиеся значениями, дают один отпечаток"""
+        first = fingerprint(
+            "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'")
+        second = fingerprint(
+            "SELECT *  FROM t WHERE id IN (%s) AND name = 'b''c'")
+        self.assertEqual(first, second)
+        self.assertEqual(
+            first[0], 'SELECT * FROM t WHERE id IN (?+) AND name = ?')
+
+    def test_request_queries_are_logged_with_plan(self):
+        """Медленный запрос страницы пишется с представлением и планом"""
+        Client().get(reverse('posts:index'))
+        entries = list(read_log(self.log))
+        self.assertTrue(entries)
+        entry = entries[0]
+        self.assertEqual(entry['view'], 'posts:index')
+        self.assertIn('posts_post', entry['sql'])
+        self.assertTrue(entry['plan'])
+        self.assertTrue(entry['source'].startswith('posts/'))
+
+    def test_template_line(self):
+        """Запрос ленивого queryset из шаблона помнит строку шаблона"""
+        template = engines['django'].from_string(
+            'Посты:\n{% for post in posts %}{{ post.text }}{% endfor %}')
+        request = RequestFactory().get('/')
+        with connection.execute_wrapper(SlowQueryLogger(request, 0)):
+            template.render({'posts': Post.objects.all()})
+        entry, = read_log(self.log)
+        self.assertTrue(entry['template'].endswith(':2'))
+        self.assertIsNone(entry['view'])
+
+    def test_write_error_does_not_break_request(self):
+        """Ошибка записи журнала уходит в logging, а страница
+        отдается как обычно"""
+        with override_settings(SLOW_QUERY_LOG=os.path.dirname(self.log)):
+            with self.assertLogs('core.slow_queries', 'WARNING') as logs:
+                response = Client().get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Не удалось записать', logs.output[0])
+
+    @override_settings(SLOW_QUERY_THRESHOLD=None)
+    def test_disabled(self):
+        """Без порога журнал не пишется"""
+        Client().get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_command_report(self):
+        """Команда slow_queries складывает повторы одного запроса"""
+        for _ in range(3):
+            Client().get(reverse('posts:post_detail', args=[1]))
+        out = StringIO()
+        call_command('slow_queries', '--top=1', stdout=out)
+        output = out.getvalue()
+        self.assertIn('count 3', output)
+        self.assertIn('views: posts:post_detail', output)
+        self.assertIn('plan:', output)
@@ -0,0 +1,34 @@
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+from core import write_benchmark
+from core.backends.sqlite3.base import get_write_lock
+
+
+class SQLiteBackendTest(TransactionTestCase):
+    def test_pragmas(self):
+        """Соединение получает настройки из PRAGMAS"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_transaction_holds_write_lock(self):
+        """Транзакция держит блокировку записи до коммита или отката"""
+        lock = get_write_lock(connection.settings_dict['NAME'])
+        with transaction.atomic():
+            self.assertTrue(lock.locked())
+            with transaction.atomic():
+                self.assertTrue(lock.locked())
+        self.assertFalse(lock.locked())
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                raise ValueError
+        self.assertFalse(lock.locked())
+
+    def test_concurrent_writes_do_not_fail(self):
+        """Параллельные транзакции чтение-запись проходят без ошибок"""
+        result = write_benchmark.run('tuned', threads=4, writes=20)
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['writes'], 80)
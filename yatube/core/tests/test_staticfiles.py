@@ -0,0 +1,117 @@
+import gzip
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import http_date
+
+from core.staticfiles import (
+    IMMUTABLE_CACHE_CONTROL, MUTABLE_CACHE_CONTROL, PrecompressedStaticFiles,
+    accepts_gzip)
+
+CSS = 'css/bootstrap.min.css'
+
+
+def django_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+class StaticPipelineTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        settings_override = override_settings(STATIC_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.app = PrecompressedStaticFiles(django_app)
+        self.hashed = staticfiles_storage.stored_name(CSS)
+
+    def request(self, path, **environ):
+        environ = {'REQUEST_METHOD': 'GET', 'PATH_INFO': path, **environ}
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        response['body'] = b''.join(self.app(environ, start_response))
+        return response
+
+    def test_collectstatic_hashes_and_compresses(self):
+        """collectstatic пишет имена с хешем и их .gz-копии"""
+        self.assertNotEqual(self.hashed, CSS)
+        self.assertEqual(static(CSS), settings.STATIC_URL + self.hashed)
+        with open(os.path.join(self.root, self.hashed), 'rb') as file:
+            original = file.read()
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), original)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'img', 'logo.png.gz')))
+
+    def test_serves_precompressed_file(self):
+        """Клиент с gzip получает .gz и кэширует файл на год"""
+        url = settings.STATIC_URL + self.hashed
+        response = self.request(url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            response['headers']['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(
+            response['headers']['Content-Type'], 'text/css')
+        plain = self.request(url)
+        self.assertNotIn('Content-Encoding', plain['headers'])
+        self.assertEqual(gzip.decompress(response['body']), plain['body'])
+        refused = self.request(url, HTTP_ACCEPT_ENCODING='br, gzip;q=0')
+        self.assertNotIn('Content-Encoding', refused['headers'])
+        self.assertEqual(refused['body'], plain['body'])
+
+    def test_accepts_gzip_quality(self):
+        """gzip с q=0 — отказ, * без gzip разрешает его"""
+        cases = {
+            'gzip': True, 'GZIP;q=0.5': True, 'gzip;q=0': False,
+            'gzip; q=0.000, br': False, 'gzip;q=bad': False, 'br': False,
+            '*;q=0.1': True, 'gzip;q=0, *': False, '': False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                self.assertIs(
+                    accepts_gzip({'HTTP_ACCEPT_ENCODING': header}), expected)
+
+    def test_unhashed_name_and_conditional_get(self):
+        """Имя без хеша кэшируется ненадолго, повтор получает 304"""
+        response = self.request(settings.STATIC_URL + CSS)
+        self.assertEqual(
+            response['headers']['Cache-Control'], MUTABLE_CACHE_CONTROL)
+        response = self.request(
+            settings.STATIC_URL + CSS,
+            HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(response['body'], b'')
+
+    def test_other_paths_go_to_django(self):
+        """Чужие пути и выход за STATIC_ROOT уходят в Django"""
+        for path in ('/', settings.STATIC_URL + '../wsgi.py',
+                     settings.STATIC_URL + 'missing.css'):
+            with self.subTest(path=path):
+                self.assertEqual(self.request(path)['body'], b'django')
+
+
+class MissingManifestTest(SimpleTestCase):
+    def test_strict_storage_requires_manifest(self):
+        """Без collectstatic строгое хранилище падает, а не отдает имя
+        без хеша"""
+        with tempfile.TemporaryDirectory() as root:
+            with override_settings(
+                    STATIC_ROOT=root, STATICFILES_MANIFEST_STRICT=True):
+                with self.assertRaisesMessage(ValueError, 'collectstatic'):
+                    static(CSS)
+            with override_settings(
+                    STATIC_ROOT=root, STATICFILES_MANIFEST_STRICT=False):
+                self.assertEqual(static(CSS), settings.STATIC_URL + CSS)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import metrics as request_metrics
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@staff_member_required
+def _metrics_page(request):
+    return HttpResponse(request_metrics.render(), content_type=CONTENT_TYPE)
+
+
+def metrics(request):
+    """Метрики запросов для Prometheus. Доступны сотрудникам,
+    а сборщику — по заголовку Authorization: Bearer METRICS_TOKEN."""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and constant_time_compare(authorization, f'Bearer {token}'):
+        return HttpResponse(
+            request_metrics.render(), content_type=CONTENT_TYPE)
+    return _metrics_page(request)
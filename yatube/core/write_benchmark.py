@@ -0,0 +1,84 @@
+"""Замер конкурентной записи: стандартный backend SQLite против
+core.backends.sqlite3.
+
+Каждый поток повторяет транзакцию, похожую на post_create: сначала
+чтение, затем INSERT. Базы — временные файлы, рабочая не трогается.
+"""
+import os
+import tempfile
+import threading
+import time
+
+from django.db import OperationalError, connections, transaction
+
+ENGINES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'core.backends.sqlite3',
+}
+TABLE = 'write_benchmark'
+PAYLOAD = 'Тестовый пост ' * 10
+
+
+def write(alias, writes, barrier, totals, totals_lock):
+    connection = connections[alias]
+    done = errors = 0
+    barrier.wait()
+    for _ in range(writes):
+        try:
+            with transaction.atomic(using=alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+                    cursor.execute(
+                        f'INSERT INTO {TABLE} (text) VALUES (%s)', [PAYLOAD])
+            done += 1
+        except OperationalError:
+            errors += 1
+    connection.close()
+    with totals_lock:
+        totals['writes'] += done
+        totals['errors'] += errors
+
+
+def run(name, threads=8, writes=100):
+    """Возвращает число успешных записей, ошибок и записей в секунду
+    для backend name из ENGINES."""
+    alias = f'write_benchmark_{name}'
+    with tempfile.TemporaryDirectory() as directory:
+        connections.databases[alias] = {
+            'ENGINE': ENGINES[name],
+            'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+        }
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    f'CREATE TABLE {TABLE} '
+                    '(id INTEGER PRIMARY KEY, text TEXT NOT NULL)')
+            connections[alias].close()
+            totals = {'writes': 0, 'errors': 0}
+            totals_lock = threading.Lock()
+            # Все потоки стартуют одновременно, как запросы в пике
+            barrier = threading.Barrier(threads + 1)
+            workers = [
+                threading.Thread(
+                    target=write,
+                    args=(alias, writes, barrier, totals, totals_lock),
+                )
+                for _ in range(threads)
+            ]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            del connections.databases[alias]
+            if hasattr(connections._connections, alias):
+                delattr(connections._connections, alias)
+    return {
+        'writes': totals['writes'],
+        'errors': totals['errors'],
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(totals['writes'] / elapsed),
+    }
@@ -1,20 +1,49 @@
 from django.contrib import admin
 
+from .forms import use_cached_group_choices
 from .models import Post
 from .models import Group
+from .paginators import EstimatedCountPaginator
+from .search import filter_posts
 
 
 class PostAdmin(admin.ModelAdmin):
     # Перечисляем поля, которые должны отображаться в админке
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    # Автор и группа приходят одним запросом вместе с постами
+    list_select_related = ('author', 'group')
     # Добавляем интерфейс для поиска по тексту постов
     search_fields = ('text',)
     # Добавляем возможность редактировать поля group в админке
     list_editable = ('group',)
     # Добавляем возможность фильтрации по дате
     list_filter = ('pub_date',)
+    # Навигация по датам идет по индексу на pub_date
+    date_hierarchy = 'pub_date'
+    # Большую таблицу не считаем точно, а второй COUNT не делаем вовсе
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     # Это свойство сработает для всех колонок: где пусто — там будет эта строка
     empty_value_display = '-пусто-'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по индексу FTS5 вместо LIKE '%...%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return filter_posts(queryset, search_term), False
+
+    def get_changelist_formset(self, request, **kwargs):
+        formset = super().get_changelist_formset(request, **kwargs)
+
+        class CachedGroupChoicesFormSet(formset):
+            # Без этого каждая строка со своим <select> заново
+            # выбирает все группы из базы
+            def _construct_form(self, i, **kwargs):
+                form = super()._construct_form(i, **kwargs)
+                use_cached_group_choices(form.fields['group'])
+                return form
+
+        return CachedGroupChoicesFormSet
 # При регистрации модели Post источником конфигурации для неё назначаем
 # класс PostAdmin
 
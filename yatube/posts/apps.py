@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+SEARCH_INDEX_MIGRATION = ('posts', '0016_post_search_index')
+
+
+def ensure_search_index(sender, using, **kwargs):
+    # Миграции SQLite пересоздают posts_post и теряют триггеры FTS
+    from .search import ensure_search_index
+    connection = connections[using]
+    applied = MigrationRecorder(connection).applied_migrations()
+    if SEARCH_INDEX_MIGRATION in applied:
+        ensure_search_index(connection)
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        # Подключаем обработчики сигналов модели Post
+        from . import signals  # noqa: F401
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,187 @@
+"""Архив старых постов.
+
+Команда archive_posts пачками переносит посты старше заданной даты
+из Post в ArchivedPost той же базы: таблица постов и ее индексы
+остаются размером с «горячие» посты, которые читают почти все
+запросы. id, даты и счетчики авторов и групп при переносе не
+меняются.
+
+Страница поста, профиль и лента группы дочитывают архив сами:
+пост, которого нет в Post, ищется по тому же id в архиве, а лента,
+у которой в Post не хватило записей на страницу, добирает их из
+архива по тому же ключу (pub_date, id). Пока архив пуст — а это
+видно по границе в кэше, — ленты лишних запросов не делают.
+Граница живет в кэше ARCHIVE_BOUNDARY_TIMEOUT секунд: архивация
+идет отдельным процессом, и при LocMemCache процессы сервера узнают
+о ней только так. Страница поста проверяет архив всегда, когда
+поста нет в Post, поэтому устаревшая граница не дает 404.
+"""
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from django.http import Http404
+
+from . import page_cache, timeline
+from .models import ArchivedPost, Group, GroupStats, Post, User
+from .paginators import NEXT, KeysetPaginator
+
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_BOUNDARY_KEY = 'posts:archive_boundary'
+# archive_posts работает в отдельном процессе и не может сбросить
+# LocMemCache сервера: процессы перечитывают границу хотя бы так часто
+ARCHIVE_BOUNDARY_TIMEOUT = 60
+ARCHIVE_FIELDS = ('id', 'text', 'pub_date', 'updated', 'author', 'group')
+
+
+def get_archive_boundary():
+    """pub_date самого нового архивного поста или None, если архив
+    пуст. Значение живет в кэше ARCHIVE_BOUNDARY_TIMEOUT секунд."""
+    cached = cache.get(ARCHIVE_BOUNDARY_KEY)
+    if cached is None:
+        # Кортеж, чтобы отличить пустой архив от промаха кэша
+        cached = (
+            ArchivedPost.objects.aggregate(
+                boundary=Max('pub_date'))['boundary'],
+        )
+        cache.set(ARCHIVE_BOUNDARY_KEY, cached, ARCHIVE_BOUNDARY_TIMEOUT)
+    return cached[0]
+
+
+def reset_archive_boundary():
+    cache.delete(ARCHIVE_BOUNDARY_KEY)
+
+
+def move_batch(before, batch_size):
+    """Переносит в архив до batch_size самых старых постов, раньше
+    before, и возвращает их строки (словари ARCHIVE_FIELDS)."""
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        rows = list(
+            Post.objects.using(DEFAULT_DB_ALIAS)
+            .filter(pub_date__lt=before).order_by('pub_date', 'id')
+            .values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return rows
+        ArchivedPost.objects.using(DEFAULT_DB_ALIAS).bulk_create([
+            ArchivedPost(
+                id=row['id'], text=row['text'], pub_date=row['pub_date'],
+                updated=row['updated'], author_id=row['author'],
+                group_id=row['group'])
+            for row in rows
+        ])
+        ids = [row['id'] for row in rows]
+        # Дата активности группы остается, ссылка на пост — нет
+        GroupStats.objects.using(DEFAULT_DB_ALIAS).filter(
+            last_post_id__in=ids).update(last_post=None)
+        # Пост не удален, а переехал: сигналы post_delete уменьшили бы
+        # счетчики и сбросили кэш страниц, поэтому удаляем без них.
+        # Индекс поиска чистят триггеры FTS5
+        Post.objects.using(DEFAULT_DB_ALIAS).filter(
+            id__in=ids)._raw_delete(DEFAULT_DB_ALIAS)
+    return rows
+
+
+def archive_posts(before, batch_size=ARCHIVE_BATCH_SIZE, on_batch=None):
+    """Переносит в архив все посты раньше before пачками по
+    batch_size, каждая в своей транзакции. on_batch(перенесено)
+    вызывается после каждой пачки. Возвращает число постов."""
+    moved = 0
+    author_ids = set()
+    group_ids = set()
+    while True:
+        rows = move_batch(before, batch_size)
+        if not rows:
+            break
+        moved += len(rows)
+        author_ids.update(row['author'] for row in rows)
+        group_ids.update(row['group'] for row in rows if row['group'])
+        if on_batch is not None:
+            on_batch(moved)
+    if moved:
+        reset_archive_boundary()
+        # Главная архив не читает: старые посты уходят из нее. У лент
+        # авторов и групп меняется раскладка по таблицам, а с ней
+        # и закэшированные числа постов (CachedCountPaginator)
+        timeline.invalidate_timeline()
+        usernames = User.objects.filter(
+            id__in=author_ids).values_list('username', flat=True)
+        slugs = Group.objects.filter(
+            id__in=group_ids).values_list('slug', flat=True)
+        page_cache.invalidate(
+            page_cache.index_scope(),
+            page_cache.groups_scope(),
+            *[page_cache.profile_scope(username) for username in usernames],
+            *[page_cache.group_scope(slug) for slug in slugs],
+        )
+    return moved
+
+
+def get_post_or_404(queryset, archived, post_id):
+    """Пост из queryset или, если его там нет, из архива. Архив
+    проверяется и при пустой границе: она может быть устаревшей,
+    а лишний запрос достается только несуществующим постам."""
+    post = queryset.filter(id=post_id).first()
+    if post is None:
+        post = archived.filter(id=post_id).first()
+    if post is None:
+        raise Http404('Пост не найден')
+    return post
+
+
+class ArchivePaginator(KeysetPaginator):
+    """KeysetPaginator для ленты, которая продолжается в архиве.
+
+    Архив старше горячих постов, поэтому страница вперед читает
+    архив, только если в Post не хватило записей, а страница назад
+    — наоборот. Записи обеих таблиц сливаются по ключу (pub_date,
+    id), так что границу между ними курсор не замечает.
+    """
+
+    def __init__(self, object_list, archived, per_page=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.archived = KeysetPaginator(archived, self.per_page)
+
+    def get_cursor_page(self, cursor=None):
+        boundary = get_archive_boundary()
+        direction, key, posts = self.get_cursor_queryset(cursor)
+        if boundary is None:
+            return self.build_cursor_page(direction, key, list(posts))
+        _, _, archived = self.archived.get_cursor_queryset(cursor)
+        if direction == NEXT:
+            first, second = posts, archived
+        elif key[0] > boundary:
+            # Все архивные посты старше курсора
+            return self.build_cursor_page(direction, key, list(posts))
+        else:
+            first, second = archived, posts
+        object_list = list(first)
+        if len(object_list) <= self.per_page:
+            object_list = sorted(
+                object_list + list(second),
+                key=lambda post: (post.pub_date, post.pk),
+                reverse=direction == NEXT,
+            )[:self.per_page + 1]
+        return self.build_cursor_page(direction, key, object_list)
+
+    def get_counts(self):
+        """(постов в Post, постов в архиве)."""
+        if get_archive_boundary() is None:
+            return super().get_counts() + (0,)
+        return (
+            self.count_rows(self.object_list),
+            self.count_rows(self.archived.object_list),
+        )
+
+    def page(self, number):
+        """Страница ?page=N: сначала посты из Post, за ними архив."""
+        number = self.validate_number(number)
+        hot_count = self.counts[0]
+        bottom = (number - 1) * self.per_page
+        top = min(bottom + self.per_page, self.count)
+        object_list = []
+        if bottom < hot_count:
+            object_list = list(self.object_list[bottom:top])
+        if top > hot_count:
+            object_list += list(self.archived.object_list[
+                max(bottom - hot_count, 0):top - hot_count])
+        return self._get_page(object_list, number, self)
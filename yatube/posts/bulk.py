@@ -0,0 +1,296 @@
+"""Помощники для массовой загрузки постов.
+
+bulk_create не вызывает сигналы модели Post, поэтому после него
+счетчики, буфер главной и кэш страниц нужно обновить явно —
+это делает refresh_derived_data(). Индекс поиска FTS5 держится
+триггерами и обновляется сам.
+"""
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import AutoField, Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import page_cache, timeline
+from .models import ArchivedPost, AuthorStats, Group, GroupStats, Post
+
+User = get_user_model()
+
+IMPORT_CHUNK_SIZE = 10000
+IMPORT_BATCH_SIZE = 1000
+# Сколько id держит кэш поиска авторов и групп, прежде чем сброситься
+LOOKUP_CACHE_SIZE = 50000
+
+
+class RecordError(ValueError):
+    """Строку импорта нельзя превратить в пост."""
+
+
+def is_key(value):
+    """Годится ли значение в ключ LookupCache: имя или id."""
+    return isinstance(value, str) or (
+        isinstance(value, int) and not isinstance(value, bool))
+
+
+def related_key(record, field):
+    """Ключ автора или группы записи как есть, без проверок:
+    field_id, если он есть, иначе field (username или slug)."""
+    return record.get(f'{field}_id', record.get(field))
+
+
+class LookupCache:
+    """Кэш natural key -> id, который дозагружает недостающие
+    ключи одним запросом на пачку строк. Целые ключи считаются
+    самими id и только проверяются на существование."""
+
+    def __init__(self, queryset, field, max_size=None):
+        self.queryset = queryset
+        self.field = field
+        self.max_size = max_size or LOOKUP_CACHE_SIZE
+        self.ids = {}
+
+    def load(self, keys):
+        # Ключи не того типа (список из JSON и т. п.) не ищем:
+        # build_post() отклонит такие записи сам
+        keys = {key for key in keys if is_key(key) and key}
+        missing = keys - self.ids.keys()
+        if not missing:
+            return
+        if len(self.ids) + len(missing) > self.max_size:
+            # После сброса грузим заново все ключи пачки, а не только
+            # новые: старые пачке тоже нужны
+            self.ids.clear()
+            missing = keys
+        names = {key for key in missing if isinstance(key, str)}
+        ids = missing - names
+        found = dict(
+            self.queryset.filter(
+                Q(**{f'{self.field}__in': names}) | Q(id__in=ids))
+            .values_list(self.field, 'id')
+        )
+        found.update({pk: pk for pk in found.values() if pk in ids})
+        # Отсутствующие тоже запоминаем, чтобы не искать их повторно
+        self.ids.update({key: found.get(key) for key in missing})
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def bulk_create_posts(posts, batch_size=IMPORT_BATCH_SIZE):
+    """bulk_create, который сохраняет pub_date постов как есть.
+
+    bulk_create вызывает pre_save, и auto_now_add заменил бы даты
+    из источника текущим временем. Поэтому посты вставляются
+    raw-вставкой, которая берет значения полей без pre_save, а пустые
+    pub_date и updated заполняются здесь. Поле модели не меняется,
+    так что save() в других потоках не затрагивается."""
+    now = timezone.now()
+    for post in posts:
+        post.pub_date = post.pub_date or now
+        post.updated = post.updated or now
+    fields = [
+        field for field in Post._meta.concrete_fields
+        if not isinstance(field, AutoField)
+    ]
+    using = router.db_for_write(Post)
+    with transaction.atomic(using=using, savepoint=False):
+        for start in range(0, len(posts), batch_size):
+            Post.objects._insert(
+                posts[start:start + batch_size], fields=fields, raw=True,
+                using=using)
+    return posts
+
+
+def recount(model, field, keys=None):
+    """Пересчитывает posts_count по таблицам постов и архива.
+    keys — id авторов или групп, которые нужно пересчитать;
+    None — пересчитать все. Возвращает число исправленных строк."""
+    fixed = 0
+    # Архивные посты тоже входят в счетчики: профиль и группа их показывают
+    tables = [
+        table.objects.order_by().exclude(**{field: None})
+        for table in (Post, ArchivedPost)
+    ]
+    stats = model.objects.select_for_update()
+    if keys is not None:
+        tables = [
+            posts.filter(**{f'{field}__in': keys}) for posts in tables]
+        stats = stats.filter(pk__in=keys)
+    with transaction.atomic():
+        actual = Counter()
+        for posts in tables:
+            actual.update(dict(
+                posts.values_list(field).annotate(total=Count('id'))))
+        stored = dict(stats.values_list('pk', 'posts_count'))
+        for pk in stored.keys() | actual.keys():
+            total = actual.get(pk, 0)
+            if stored.get(pk) == total:
+                continue
+            model.objects.update_or_create(
+                pk=pk, defaults={'posts_count': total})
+            fixed += 1
+    return fixed
+
+
+def refresh_group_activity(group_ids=None):
+    """Заново находит последний пост и дату последней активности
+    групп group_ids (None — всех). Дата берется из архива, если
+    в Post у группы постов не осталось."""
+    def latest(model):
+        return model.objects.filter(group_id=OuterRef('pk')).order_by(
+            '-pub_date', '-id')
+
+    stats = GroupStats.objects.all()
+    if group_ids is not None:
+        stats = stats.filter(pk__in=group_ids)
+    return stats.update(
+        last_post_id=Subquery(latest(Post).values('id')[:1]),
+        last_pub_date=Coalesce(
+            Subquery(latest(Post).values('pub_date')[:1]),
+            Subquery(latest(ArchivedPost).values('pub_date')[:1])),
+    )
+
+
+def refresh_derived_data(author_ids=None, group_ids=None):
+    """Приводит производные данные в соответствие с таблицей постов.
+    author_ids и group_ids — авторы и группы, чьи счетчики
+    пересчитать и чьи страницы сбросить. None — пересчитать все,
+    а из страниц сбросить только главную и каталог групп."""
+    authors = recount(AuthorStats, 'author', author_ids)
+    groups = recount(GroupStats, 'group', group_ids)
+    refresh_group_activity(group_ids)
+    timeline.invalidate_timeline()
+    usernames = User.objects.filter(
+        id__in=author_ids or ()).values_list('username', flat=True)
+    slugs = Group.objects.filter(
+        id__in=group_ids or ()).values_list('slug', flat=True)
+    page_cache.invalidate(
+        page_cache.index_scope(),
+        page_cache.groups_scope(),
+        *[page_cache.profile_scope(username) for username in usernames],
+        *[page_cache.author_scope(pk) for pk in author_ids or ()],
+        *[page_cache.group_scope(slug) for slug in slugs],
+    )
+    return authors, groups
+
+
+def get_string(record, field):
+    """Строковое поле записи; пустая строка, если поля нет."""
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise RecordError(f'поле {field} должно быть строкой')
+    return value
+
+
+def get_pub_date(record):
+    """pub_date записи или текущее время, если его нет."""
+    value = get_string(record, 'pub_date')
+    if not value:
+        return timezone.now()
+    try:
+        # ValueError — у даты верный формат, но ее нет (30 февраля)
+        pub_date = parse_datetime(value)
+    except ValueError:
+        pub_date = None
+    if pub_date is None:
+        raise RecordError(f'неверная дата {value!r}')
+    if timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return pub_date
+
+
+def get_related_key(record, field):
+    """Ключ автора или группы для LookupCache: целый field_id
+    или строка field; пустая строка, если нет ни того, ни другого."""
+    if f'{field}_id' not in record:
+        return get_string(record, field)
+    value = record[f'{field}_id']
+    # bool — тоже int, но id из него не выйдет
+    if value is not None and type(value) is not int:
+        raise RecordError(f'поле {field}_id должно быть целым')
+    return value or ''
+
+
+def build_post(record, authors, groups):
+    """Собирает Post из словаря с ключами text, author (username)
+    или author_id, group (slug) или group_id (необязательно)
+    и pub_date (ISO 8601, необязательно)."""
+    if not isinstance(record, dict):
+        raise RecordError('запись должна быть словарем')
+    text = get_string(record, 'text').strip()
+    if not text:
+        raise RecordError('пустой текст')
+    author = get_related_key(record, 'author')
+    author_id = authors.get(author)
+    if author_id is None:
+        raise RecordError(f'нет автора {author!r}')
+    group = get_related_key(record, 'group')
+    group_id = None
+    if group:
+        group_id = groups.get(group)
+        if group_id is None:
+            raise RecordError(f'нет группы {group!r}')
+    return Post(
+        text=text, author_id=author_id, group_id=group_id,
+        pub_date=get_pub_date(record))
+
+
+def import_posts(records, chunk_size=IMPORT_CHUNK_SIZE,
+                 batch_size=IMPORT_BATCH_SIZE, on_error=None, on_chunk=None):
+    """Загружает посты из итератора словарей.
+
+    Автор и группа записи задаются именами (author, group) или id
+    (author_id, group_id). Записи читаются пачками по chunk_size:
+    для каждой пачки авторы и группы дозагружаются в кэш одним
+    запросом, а посты вставляются bulk_create_posts по batch_size
+    в отдельной транзакции. В памяти одновременно лежит только одна
+    пачка. on_error(номер, ошибка) вызывается для пропущенных строк,
+    on_chunk(загружено) — после каждой пачки. Счетчики
+    пересчитываются только у затронутых авторов и групп. Возвращает
+    (загружено, пропущено).
+    """
+    authors = LookupCache(User.objects.all(), 'username')
+    groups = LookupCache(Group.objects.all(), 'slug')
+    author_ids = set()
+    group_ids = set()
+    created = skipped = 0
+    records = enumerate(records, start=1)
+    try:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            dicts = [
+                record for _, record in chunk
+                if isinstance(record, dict)
+            ]
+            authors.load(
+                related_key(record, 'author') for record in dicts)
+            groups.load(
+                related_key(record, 'group') for record in dicts)
+            posts = []
+            for number, record in chunk:
+                try:
+                    posts.append(build_post(record, authors, groups))
+                except RecordError as error:
+                    skipped += 1
+                    if on_error is not None:
+                        on_error(number, error)
+            bulk_create_posts(posts, batch_size)
+            author_ids.update(post.author_id for post in posts)
+            group_ids.update(
+                post.group_id for post in posts if post.group_id)
+            created += len(posts)
+            if on_chunk is not None:
+                on_chunk(created)
+    finally:
+        # Уже закоммиченные пачки обновляются, даже если импорт упал
+        if created:
+            refresh_derived_data(author_ids, group_ids)
+    return created, skipped
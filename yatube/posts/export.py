@@ -0,0 +1,139 @@
+"""Потоковая выгрузка постов в NDJSON и CSV.
+
+Посты читаются пачками по ключу (pub_date, id) — по тем же
+индексам, что и ленты. Каждая пачка — отдельный короткий запрос,
+поэтому выгрузка не держит открытой транзакцию чтения и не копит
+строки в памяти, сколько бы постов ни было в базе. Архив
+(ArchivedPost) читается так же и сливается с постами по тому же
+ключу, так что выгрузка всего сайта не теряет старые посты.
+"""
+import csv
+import heapq
+import json
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ArchivedPost, Post
+
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_FIELDS = ('id', 'text', 'author', 'group', 'pub_date')
+EXPORT_CHUNK_SIZE = 2000
+COLUMNS = (
+    'id', 'text', 'author__username', 'group__slug', 'pub_date')
+
+
+class ExportError(ValueError):
+    """Неверные параметры выгрузки."""
+
+
+def parse_moment(value):
+    """Разбирает дату или дату со временем из ISO 8601.
+    Дата без времени означает начало дня."""
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        # Формат верный, но такого дня нет: 2020-02-30
+        moment = day = None
+    if moment is None:
+        if day is None:
+            raise ExportError(f'Неверная дата: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def get_export_queryset(author=None, group=None, since=None, until=None,
+                        model=Post):
+    """Посты автора (username), группы (slug) и за период
+    [since, until); пустой фильтр не ограничивает выгрузку.
+    model=ArchivedPost — те же посты из архива."""
+    posts = model.objects.all()
+    if author:
+        posts = posts.filter(author__username=author)
+    if group:
+        posts = posts.filter(group__slug=group)
+    since, until = parse_moment(since), parse_moment(until)
+    if since is not None:
+        posts = posts.filter(pub_date__gte=since)
+    if until is not None:
+        posts = posts.filter(pub_date__lt=until)
+    return posts
+
+
+def get_export_querysets(**filters):
+    """(посты, архив) с одними фильтрами get_export_queryset."""
+    return (
+        get_export_queryset(**filters),
+        get_export_queryset(model=ArchivedPost, **filters),
+    )
+
+
+def iter_rows(posts, chunk_size=EXPORT_CHUNK_SIZE):
+    """Возвращает строки выгрузки от старых постов к новым."""
+    posts = posts.order_by('pub_date', 'id').values_list(*COLUMNS)
+    chunk = posts[:chunk_size]
+    while True:
+        count = 0
+        for count, last in enumerate(
+                chunk.iterator(chunk_size=chunk_size), start=1):
+            yield dict(zip(EXPORT_FIELDS, last))
+        # Неполная пачка — последняя, лишний запрос не нужен
+        if count < chunk_size:
+            return
+        pub_date, pk = last[-1], last[0]
+        # Условие по одному pub_date позволяет начать поиск в индексе
+        chunk = posts.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk),
+            pub_date__gte=pub_date,
+        )[:chunk_size]
+
+
+def to_ndjson(rows):
+    for row in rows:
+        row['pub_date'] = row['pub_date'].isoformat()
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Псевдофайл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def to_csv(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        row['pub_date'] = row['pub_date'].isoformat()
+        yield writer.writerow(row)
+
+
+def merge_rows(*querysets, chunk_size=EXPORT_CHUNK_SIZE):
+    """Строки нескольких таблиц постов в общем порядке (pub_date, id)."""
+    return heapq.merge(
+        *[iter_rows(posts, chunk_size) for posts in querysets],
+        key=lambda row: (row['pub_date'], row['id']))
+
+
+def export_posts(posts, file_format, chunk_size=EXPORT_CHUNK_SIZE,
+                 archived=None):
+    """Итератор строк выгрузки в формате file_format. archived —
+    queryset архива, посты которого войдут в выгрузку."""
+    if file_format not in FORMATS:
+        raise ExportError(f'Неизвестный формат: {file_format}')
+    serialize = to_csv if file_format == 'csv' else to_ndjson
+    if archived is None:
+        return serialize(iter_rows(posts, chunk_size))
+    return serialize(merge_rows(posts, archived, chunk_size=chunk_size))
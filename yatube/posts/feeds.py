@@ -0,0 +1,181 @@
+"""RSS и Atom ленты главной, групп и авторов.
+
+Ленты отдаются с ETag и Last-Modified, поэтому большинство опросов
+читалок заканчивается ответом 304 без сборки ленты. Оба валидатора
+строятся из данных: id и updated постов, которые попадут в ленту,
+читаются одним запросом по индексу ленты. Новый пост меняет первый
+id, удаление — список id, правка поста, имени автора или группы —
+его updated (posts.signals). Поэтому валидаторы одинаковы во всех
+процессах и не меняются, пока лента та же. Тело ленты кэшируется
+под своим ETag.
+"""
+import hashlib
+from functools import wraps
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+from django.utils.text import Truncator
+
+from . import page_cache
+from .models import Group, Post, User
+
+FEED_SIZE = 20
+# Тело ленты лежит под ее ETag и устаревшим не бывает
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+TITLE_WORDS = 8
+
+
+def get_validators(view_name, posts):
+    """(etag, last_modified) ленты по id и updated ее постов.
+    last_modified — None, если постов нет."""
+    rows = list(posts.values_list('id', 'updated')[:FEED_SIZE])
+    state = ':'.join(f'{pk}@{updated.isoformat()}' for pk, updated in rows)
+    etag = hashlib.md5(f'{view_name}:{state}'.encode()).hexdigest()
+    last_modified = None
+    if rows:
+        last_modified = int(max(updated for _, updated in rows).timestamp())
+    return quote_etag(etag), last_modified
+
+
+def conditional_feed(view_name, get_posts):
+    """Декоратор ленты: отвечает 304 по ETag и Last-Modified,
+    а собранную ленту хранит в кэше под ее ETag. get_posts получает
+    kwargs представления."""
+    def decorator(feed):
+        @wraps(feed)
+        def wrapper(request, *args, **kwargs):
+            etag, last_modified = get_validators(
+                view_name, get_posts(**kwargs))
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+            path_hash = hashlib.md5(
+                f'{etag}:{page_cache.get_page_path(request)}'.encode()
+            ).hexdigest()
+            key = f'{page_cache.PAGE_CACHE_PREFIX}:feed:{path_hash}'
+            response = cache.get(key)
+            if response is None:
+                response = feed(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response, FEED_CACHE_TIMEOUT)
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+class IndexFeed(Feed):
+    title = 'Yatube: последние обновления'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.select_related('author', 'group')[:FEED_SIZE]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(TITLE_WORDS)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class GroupFeed(IndexFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: записи сообщества {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def items(self, group):
+        return group.posts.select_related('author', 'group')[:FEED_SIZE]
+
+
+class AuthorFeed(IndexFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: записи {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Новые записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def items(self, author):
+        return author.posts.select_related('author', 'group')[:FEED_SIZE]
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def index_posts():
+    return Post.objects.all()
+
+
+def group_posts(slug):
+    return Post.objects.filter(group__slug=slug)
+
+
+def author_posts(username):
+    return Post.objects.filter(author__username=username)
+
+
+index_rss = conditional_feed('posts:index_rss', index_posts)(IndexFeed())
+index_atom = conditional_feed(
+    'posts:index_atom', index_posts)(IndexAtomFeed())
+group_rss = conditional_feed('posts:group_rss', group_posts)(GroupFeed())
+group_atom = conditional_feed(
+    'posts:group_atom', group_posts)(GroupAtomFeed())
+profile_rss = conditional_feed(
+    'posts:profile_rss', author_posts)(AuthorFeed())
+profile_atom = conditional_feed(
+    'posts:profile_atom', author_posts)(AuthorAtomFeed())
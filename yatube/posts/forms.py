@@ -1,6 +1,30 @@
 from django import forms
+from django.core.cache import cache
 
-from .models import Post
+from .models import Group, Post
+
+GROUP_CHOICES_KEY = 'posts:group_choices'
+
+
+def get_group_choices():
+    """Варианты выбора группы, один запрос на все формы.
+    Кэш сбрасывается сигналами при изменении групп."""
+    choices = cache.get(GROUP_CHOICES_KEY)
+    if choices is None:
+        choices = list(Group.objects.order_by('title').values_list(
+            'pk', 'title'))
+        cache.set(GROUP_CHOICES_KEY, choices, None)
+    return choices
+
+
+def use_cached_group_choices(field, empty_label='---------'):
+    """Подставляет в поле группы готовые варианты вместо запроса
+    к базе при каждом рендере."""
+    field.choices = [('', empty_label)] + get_group_choices()
+    # Админка оборачивает Select в RelatedFieldWidgetWrapper
+    inner_widget = getattr(field.widget, 'widget', None)
+    if inner_widget is not None:
+        inner_widget.choices = field.choices
 
 
 class PostForm(forms.ModelForm):
@@ -15,3 +39,7 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относится пост'
         }
         fields = ('text', 'group')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        use_cached_group_choices(self.fields['group'])
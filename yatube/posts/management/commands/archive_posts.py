@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.archive import ARCHIVE_BATCH_SIZE, archive_posts
+from posts.export import ExportError, parse_moment
+
+
+class Command(BaseCommand):
+    help = ('Переносит старые посты в архив (ArchivedPost). Страницы '
+            'постов, профили и группы продолжают их показывать.')
+
+    def add_arguments(self, parser):
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument(
+            '--before',
+            help='Архивировать посты раньше этой даты (ISO 8601).')
+        cutoff.add_argument(
+            '--older-than-days', type=int,
+            help='Архивировать посты старше стольких дней.')
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+            help='Сколько постов переносить в одной транзакции.')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = parse_moment(options['before'])
+            except ExportError as error:
+                raise CommandError(str(error))
+        else:
+            before = timezone.now() - timedelta(
+                days=options['older_than_days'])
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        moved = archive_posts(
+            before, options['batch_size'],
+            on_batch=lambda moved: self.stdout.write(
+                f'перенесено {moved}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено постов: {moved}'))
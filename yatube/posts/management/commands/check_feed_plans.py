@@ -0,0 +1,75 @@
+import re
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Post
+from posts.paginators import NEXT, PREVIOUS, KeysetPaginator
+
+# Признаки плохого плана: полный проход по таблице постов
+# или сортировка во временном B-дереве
+BAD_PLAN_PATTERNS = (
+    re.compile(r'^SCAN (TABLE )?posts_post\b(?!.*USING)'),
+    re.compile(r'USE TEMP B-TREE'),
+)
+# Страница по курсору должна искать в индексе, а не просматривать его
+CURSOR_PLAN_PATTERNS = BAD_PLAN_PATTERNS + (
+    re.compile(r'^SCAN (TABLE )?posts_post\b'),
+)
+
+
+def get_feed_querysets():
+    """Запросы лент в том виде, в каком их выполняют представления.
+    Отдает тройки (название, queryset, запрещенные шаблоны плана)."""
+    feeds = {
+        'index': Post.objects.select_related('author', 'group'),
+        'group_list': Post.objects.filter(group_id=1).select_related(
+            'author', 'group'),
+        'profile': Post.objects.filter(author_id=1).select_related(
+            'author', 'group'),
+    }
+    key = SimpleNamespace(pub_date=timezone.now(), pk=1)
+    for name, posts in feeds.items():
+        paginator = KeysetPaginator(posts)
+        yield name, paginator.get_cursor_queryset()[2], BAD_PLAN_PATTERNS
+        for direction in (NEXT, PREVIOUS):
+            cursor = paginator.make_cursor(direction, key)
+            yield (
+                f'{name} (cursor {direction})',
+                paginator.get_cursor_queryset(cursor)[2],
+                CURSOR_PLAN_PATTERNS,
+            )
+
+
+def explain(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN QUERY PLAN для запросов лент и падает, '
+            'если в плане есть полный проход по таблице или сортировка.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Проверка планов поддерживает только SQLite.')
+        failed = []
+        for name, queryset, patterns in get_feed_querysets():
+            plan = explain(queryset)
+            bad = [
+                line for line in plan
+                if any(pattern.search(line) for pattern in patterns)
+            ]
+            style = self.style.ERROR if bad else self.style.SUCCESS
+            self.stdout.write(style(name))
+            for line in plan:
+                self.stdout.write(f'    {line}')
+            if bad:
+                failed.append(name)
+        if failed:
+            raise CommandError(
+                'Плохой план у запросов: ' + ', '.join(failed))
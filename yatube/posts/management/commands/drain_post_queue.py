@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import page_cache, write_behind
+
+
+class Command(BaseCommand):
+    help = ('Вставляет в базу посты из очереди write-behind '
+            '(POST_QUEUE_DIR) пачками bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=write_behind.DRAIN_BATCH_SIZE,
+            help='Постов в одной вставке.')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Не выходить, а проверять очередь каждые N секунд.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        if page_cache.is_process_local():
+            raise CommandError(
+                'Кэш LocMemCache у каждого процесса свой: посты из '
+                'очереди не попадут на главную сервера. Настройте общий '
+                'кэш (memcached, redis, файловый) в CACHES.')
+        while True:
+            created = self.drain_queue(options['batch_size'])
+            if created:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Вставлено постов: {created}'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def drain_queue(self, batch_size):
+        total = 0
+        while True:
+            created, skipped = write_behind.drain(
+                batch_size, on_error=self.report_error)
+            total += created
+            if created + skipped < batch_size:
+                return total
+
+    def report_error(self, name, error):
+        self.stderr.write(
+            f'Пост {name} перенесен в {write_behind.FAILED_DIR}: {error}')
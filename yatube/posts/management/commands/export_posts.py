@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (
+    EXPORT_CHUNK_SIZE, FORMATS, ExportError, export_posts,
+    get_export_querysets)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты вместе с архивом в NDJSON или CSV '
+            'потоком, пачками по ключу (pub_date, id).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--author', help='Username автора.')
+        parser.add_argument('--group', help='Slug группы.')
+        parser.add_argument('--since', help='Начало периода, ISO 8601.')
+        parser.add_argument(
+            '--until', help='Конец периода (не включая), ISO 8601.')
+        parser.add_argument(
+            '--output', default='-', help='Файл выгрузки, "-" — stdout.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Постов в одном запросе к базе.')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным.')
+        try:
+            posts, archived = get_export_querysets(
+                author=options['author'], group=options['group'],
+                since=options['since'], until=options['until'])
+            lines = export_posts(
+                posts, options['format'], options['chunk_size'], archived)
+        except ExportError as error:
+            raise CommandError(error)
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as file:
+            for line in lines:
+                file.write(line)
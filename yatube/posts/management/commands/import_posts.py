@@ -0,0 +1,98 @@
+import csv
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk
+
+FORMATS = ('jsonl', 'csv')
+# Больше ошибок в stderr не пишем, только считаем
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = ('Загружает посты из JSONL или CSV с полями text, author '
+            '(username), group (slug) и pub_date. Файл читается потоком, '
+            '"-" — стандартный ввод.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу или "-".')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат ввода; по умолчанию берется из расширения файла.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=bulk.IMPORT_CHUNK_SIZE,
+            help='Строк в одной транзакции.')
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk.IMPORT_BATCH_SIZE,
+            help='Строк в одном INSERT.')
+
+    def handle(self, *args, **options):
+        self.errors = 0
+        if min(options['chunk_size'], options['batch_size']) < 1:
+            raise CommandError('Размеры пачек должны быть положительными.')
+        file_format = options['format'] or self.guess_format(options['path'])
+        if options['path'] == '-':
+            return self.load(sys.stdin, file_format, options)
+        try:
+            file = open(options['path'], encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        with file:
+            return self.load(file, file_format, options)
+
+    @staticmethod
+    def guess_format(path):
+        for file_format in FORMATS:
+            if path.endswith(f'.{file_format}'):
+                return file_format
+        raise CommandError('Не удалось определить формат, укажите --format.')
+
+    def load(self, file, file_format, options):
+        if file_format == 'csv':
+            records = csv.DictReader(file)
+        else:
+            records = self.read_jsonl(file)
+        started = time.perf_counter()
+
+        def on_chunk(created):
+            self.stdout.write(
+                f'Загружено {created} ({self.rate(created, started)} строк/с)')
+
+        created, _ = bulk.import_posts(
+            records,
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            on_error=lambda number, error: self.report_error(
+                f'запись {number}', error),
+            on_chunk=on_chunk,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {created}, пропущено: {self.errors}, '
+            f'{self.rate(created, started)} строк/с'))
+
+    def read_jsonl(self, file):
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if not isinstance(record, dict):
+                self.report_error(f'строка {number}', 'не объект JSON')
+                continue
+            yield record
+
+    def report_error(self, where, error):
+        self.errors += 1
+        if self.errors <= MAX_REPORTED_ERRORS:
+            self.stderr.write(f'Пропущена {where}: {error}')
+
+    @staticmethod
+    def rate(rows, started):
+        elapsed = time.perf_counter() - started
+        return round(rows / elapsed) if elapsed else rows
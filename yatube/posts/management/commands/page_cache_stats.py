@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша страниц лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить статистику после вывода.')
+
+    def handle(self, *args, **options):
+        total_hits = total_misses = 0
+        for view_name, (hits, misses) in page_cache.get_stats().items():
+            total_hits += hits
+            total_misses += misses
+            self.stdout.write(self.format_line(view_name, hits, misses))
+        self.stdout.write(self.style.SUCCESS(
+            self.format_line('total', total_hits, total_misses)))
+        if options['reset']:
+            page_cache.reset_stats()
+
+    @staticmethod
+    def format_line(name, hits, misses):
+        requests = hits + misses
+        ratio = hits / requests if requests else 0
+        return f'{name:<20} hit {hits:>8} miss {misses:>8} ratio {ratio:.1%}'
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.bulk import recount
+from posts.models import AuthorStats, GroupStats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов авторов и групп.'
+
+    def handle(self, *args, **options):
+        authors = recount(AuthorStats, 'author')
+        groups = recount(GroupStats, 'group')
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено счетчиков: авторов {authors}, групп {groups}'))
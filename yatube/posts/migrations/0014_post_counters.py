@@ -0,0 +1,48 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    AuthorStats.objects.bulk_create(
+        AuthorStats(author_id=row['author'], posts_count=row['total'])
+        for row in Post.objects.order_by().values('author').annotate(
+            total=Count('id'))
+    )
+    GroupStats.objects.bulk_create(
+        GroupStats(group_id=row['group'], posts_count=row['total'])
+        for row in Post.objects.order_by().exclude(group=None).values(
+            'group').annotate(total=Count('id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group')),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
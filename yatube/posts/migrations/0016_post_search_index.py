@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:00
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from posts.search import ensure_search_index
+    ensure_search_index(schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from posts.search import drop_search_index
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:36
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def fill_activity(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ArchivedPost = apps.get_model('posts', 'ArchivedPost')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+
+    def latest(model):
+        return model.objects.filter(group_id=OuterRef('pk')).order_by(
+            '-pub_date', '-id')
+
+    GroupStats.objects.update(
+        last_post_id=Subquery(latest(Post).values('id')[:1]),
+        last_pub_date=Coalesce(
+            Subquery(latest(Post).values('pub_date')[:1]),
+            Subquery(latest(ArchivedPost).values('pub_date')[:1])),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_archived_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupstats',
+            name='last_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Post'),
+        ),
+        migrations.AddField(
+            model_name='groupstats',
+            name='last_pub_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_activity, migrations.RunPython.noop),
+    ]
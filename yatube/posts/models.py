@@ -21,6 +21,8 @@ class Post(models.Model):
         max_length=200
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    # Меняется при каждом сохранении, входит в ключ кэша карточки поста
+    updated = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -34,9 +36,130 @@ class Post(models.Model):
         related_name='posts',
         verbose_name='Группа',
         max_length=200)
+    # Архивные посты (ArchivedPost) только для чтения
+    is_archived = False
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # Индексы под ленты: главная, группа и профиль сортируются
+        # по (pub_date, id) в том же порядке, что и KeysetPaginator
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'),
+            # Последняя правка области для валидаторов страниц
+            # (posts.page_cache.get_scope_state)
+            models.Index(fields=['-updated'], name='post_updated_idx'),
+            models.Index(
+                fields=['author', '-updated'],
+                name='post_author_updated_idx'),
+            models.Index(
+                fields=['group', '-updated'],
+                name='post_group_updated_idx'),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем исходную группу: при ее смене
+        # сигналы поправят счетчики обеих групп
+        instance._loaded_group_id = dict(
+            zip(field_names, values)).get('group_id')
+        return instance
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики автора.
+
+    Обновляются сигналами posts.signals,
+    расхождения чинит команда recount_posts.
+    """
+    author = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='post_stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.author}: {self.posts_count}'
+
+
+class GroupStats(models.Model):
+    """Денормализованные счетчики и последняя активность группы.
+
+    Каталог групп читает их одним запросом вместо COUNT и
+    MAX(pub_date) по каждой группе. last_pub_date остается и тогда,
+    когда последний пост ушел в архив, а last_post обнуляется.
+    """
+    group = models.OneToOneField(
+        Group,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    last_pub_date = models.DateTimeField(null=True, blank=True)
+    last_post = models.ForeignKey(
+        Post,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+'
+    )
+
+    def __str__(self):
+        return f'{self.group}: {self.posts_count}'
+
+
+class ArchivedPost(models.Model):
+    """Старый пост, перенесенный из Post командой archive_posts.
+
+    id и даты сохраняются, поэтому ссылки и курсоры лент продолжают
+    работать: представления дочитывают архив, если пост не нашелся
+    в Post (posts.archive). Архивные посты не редактируются.
+    """
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Текст поста')
+    pub_date = models.DateTimeField()
+    updated = models.DateTimeField()
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts'
+    )
+    group = models.ForeignKey(
+        Group,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа')
+    is_archived = True
+
+    class Meta:
+        ordering = ['-pub_date', '-id']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='archived_feed_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='archived_author_feed_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='archived_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -0,0 +1,366 @@
+"""Кэш целых страниц лент для анонимных посетителей.
+
+Ключ страницы складывается из имени представления, пути с
+параметрами листания (PAGE_QUERY_PARAMS) и поколений ее областей
+(scope): главная, группа, профиль или пост. Остальные параметры
+строки запроса ленты не читают, поэтому в ключ не входят и не
+плодят копий страницы. Страница поста зависит еще и от области
+автора: на ней показано число его постов. Сигналы модели Post
+меняют поколение только тех областей, которых коснулась запись,
+поэтому остальные страницы остаются в кэше; новое имя автора
+сбрасывает все страницы, где оно показано.
+
+Поколение живет GENERATION_TIMEOUT секунд, после чего области
+выдается новое. Так изменения, о которых сигналы этого процесса
+не узнали (запись из другого процесса при LocMemCache), видны
+не позже чем через GENERATION_TIMEOUT — и в кэше страниц, и в 304.
+
+Last-Modified и ETag страницы conditional_page() строит не из
+поколения, а из данных области (get_scope_state): последнего
+updated ее постов по индексу, числа постов и показанных имен.
+Поэтому все процессы отдают одинаковые валидаторы, а неизменившаяся
+страница отвечает 304 и после смены поколения. Состояние области
+кэшируется под поколением, так что повторный 304 обходится без
+запросов к базе. Страницы, прочитанные с реплики, не кэшируются
+и валидаторов не получают (core.db_router).
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Sum
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from core.db_router import read_from_replica
+
+from .models import ArchivedPost, AuthorStats, Group, Post, User
+
+PAGE_CACHE_PREFIX = 'page_cache'
+HIT = 'hit'
+MISS = 'miss'
+CACHED_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:groups',
+)
+# Параметры строки запроса, от которых зависит страница ленты
+PAGE_QUERY_PARAMS = ('page', 'cursor')
+# Автор поста не меняется, ключ только чистится по таймауту
+POST_AUTHOR_TIMEOUT = 60 * 60 * 24
+# Наибольший срок, который страница может быть устаревшей
+GENERATION_TIMEOUT = 60 * 10
+
+
+def is_process_local():
+    """True, если у каждого процесса свой кэш (LocMemCache): тогда
+    команды в отдельном процессе не могут сбросить страницы
+    и буфер главной у процессов сервера."""
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def index_scope():
+    return 'index'
+
+
+def groups_scope():
+    return 'groups'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def profile_scope(username):
+    return f'profile:{username}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def _post_author_key(post_id):
+    return f'{PAGE_CACHE_PREFIX}:post_author:{post_id}'
+
+
+def remember_post_author(post_id, author_id):
+    """Запоминает автора поста для post_detail_scopes()."""
+    cache.set(_post_author_key(post_id), author_id, POST_AUTHOR_TIMEOUT)
+
+
+def post_detail_scopes(post_id):
+    """Области страницы поста: сам пост и его автор. Пока автор
+    неизвестен (страницу еще не рендерили), возвращает None —
+    страница не кэшируется."""
+    author_id = cache.get(_post_author_key(post_id))
+    if author_id is None:
+        return None
+    return post_scope(post_id), author_scope(author_id)
+
+
+def get_scopes(get_scope, kwargs):
+    """Области страницы списком; None, если кэшировать нельзя."""
+    scopes = get_scope(**kwargs)
+    if scopes is None:
+        return None
+    if isinstance(scopes, str):
+        return [scopes]
+    return list(scopes)
+
+
+def get_page_path(request):
+    """Путь страницы с одними параметрами листания."""
+    params = sorted(
+        (name, request.GET[name])
+        for name in PAGE_QUERY_PARAMS if name in request.GET
+    )
+    if not params:
+        return request.path
+    return f'{request.path}?{urlencode(params)}'
+
+
+def _generation_key(scope):
+    return f'{PAGE_CACHE_PREFIX}:gen:{scope}'
+
+
+def _stats_key(view_name, outcome):
+    return f'{PAGE_CACHE_PREFIX}:stats:{view_name}:{outcome}'
+
+
+def _state_key(scope, generation):
+    return f'{PAGE_CACHE_PREFIX}:state:{scope}:{generation}'
+
+
+def _new_generation():
+    return uuid4().hex
+
+
+def get_generation(scope):
+    """Текущее поколение области. Меняется при каждой invalidate()
+    и раз в GENERATION_TIMEOUT."""
+    return cache.get_or_set(
+        _generation_key(scope), _new_generation, GENERATION_TIMEOUT)
+
+
+def latest_updated(posts):
+    """MAX(updated) постов по индексу (..., -updated)."""
+    return posts.order_by('-updated').values_list(
+        'updated', flat=True).first()
+
+
+def author_state(**lookup):
+    """Имя автора, число его постов и последняя правка его постов."""
+    author = User.objects.filter(**lookup).values_list(
+        'id', 'username', 'first_name', 'last_name',
+        'post_stats__posts_count').first()
+    if author is None:
+        return None, None
+    updated = latest_updated(Post.objects.filter(author_id=author[0]))
+    return updated, author
+
+
+def group_state(slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'id', 'title', 'description', 'stats__posts_count').first()
+    if group is None:
+        return None, None
+    updated = latest_updated(Post.objects.filter(group_id=group[0]))
+    return updated, group
+
+
+def groups_state():
+    groups = tuple(
+        Group.objects.order_by('id').values_list(
+            'id', 'title', 'description', 'stats__posts_count',
+            'stats__last_post__updated'))
+    updated = max(
+        (row[-1] for row in groups if row[-1] is not None), default=None)
+    return updated, groups
+
+
+def index_state():
+    # Удаление не оставляет updated, но уменьшает счетчики авторов
+    total = AuthorStats.objects.aggregate(total=Sum('posts_count'))
+    return latest_updated(Post.objects.all()), total['total']
+
+
+def post_state(post_id):
+    for model in (Post, ArchivedPost):
+        updated = model.objects.filter(pk=post_id).values_list(
+            'updated', flat=True).first()
+        if updated is not None:
+            return updated, model.__name__
+    return None, None
+
+
+SCOPE_STATES = {
+    'index': index_state,
+    'groups': groups_state,
+    'group': group_state,
+    'profile': lambda username: author_state(username=username),
+    'author': lambda author_id: author_state(id=author_id),
+    'post': post_state,
+}
+
+
+def get_scope_state(scope):
+    """Состояние данных области: (последнее изменение или None,
+    данные для ETag). Берется из базы и кэшируется под поколением
+    области, поэтому не зависит от процесса и времени жизни
+    поколения."""
+    key = _state_key(scope, get_generation(scope))
+    state = cache.get(key)
+    if state is None:
+        kind, _, arg = scope.partition(':')
+        state = SCOPE_STATES[kind](*([arg] if arg else []))
+        cache.set(key, state, GENERATION_TIMEOUT)
+    return state
+
+
+def make_page_key(view_name, scopes, path):
+    generations = ':'.join(get_generation(scope) for scope in scopes)
+    path_hash = hashlib.md5(f'{generations}:{path}'.encode()).hexdigest()
+    return f'{PAGE_CACHE_PREFIX}:{view_name}:{path_hash}'
+
+
+def invalidate(*scopes):
+    """Сбрасывает все закэшированные страницы перечисленных областей."""
+    cache.set_many(
+        {_generation_key(scope): _new_generation() for scope in scopes},
+        GENERATION_TIMEOUT)
+
+
+def record(view_name, outcome):
+    key = _stats_key(view_name, outcome)
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        cache.add(key, 1, None)
+
+
+def get_stats():
+    """Возвращает {view_name: (hits, misses)}."""
+    keys = {
+        (view_name, outcome): _stats_key(view_name, outcome)
+        for view_name in CACHED_VIEWS
+        for outcome in (HIT, MISS)
+    }
+    values = cache.get_many(keys.values())
+    return {
+        view_name: (
+            values.get(keys[view_name, HIT], 0),
+            values.get(keys[view_name, MISS], 0),
+        )
+        for view_name in CACHED_VIEWS
+    }
+
+
+def reset_stats():
+    cache.delete_many([
+        _stats_key(view_name, outcome)
+        for view_name in CACHED_VIEWS
+        for outcome in (HIT, MISS)
+    ])
+
+
+def cache_anonymous_page(view_name, get_scope):
+    """Декоратор представления: отдает анонимным GET-запросам
+    закэшированную страницу. get_scope получает kwargs представления
+    и возвращает область страницы, их кортеж или None, если страницу
+    кэшировать нельзя."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            timeout = settings.PAGE_CACHE_TIMEOUT
+            if (
+                not timeout
+                or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(get_scope, kwargs)
+            if scopes is None:
+                record(view_name, MISS)
+                return view(request, *args, **kwargs)
+            key = make_page_key(view_name, scopes, get_page_path(request))
+            response = cache.get(key)
+            if response is not None:
+                record(view_name, HIT)
+                return response
+            record(view_name, MISS)
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.cookies
+                and not read_from_replica(request)
+            ):
+                cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def get_validators(request, view_name, scopes):
+    """Возвращает (etag, last_modified) страницы по состоянию данных
+    ее областей.
+
+    Last-Modified — последний updated постов областей (None, если
+    постов нет). ETag учитывает еще число постов и показанные имена,
+    которых updated не видит, а также адрес и пользователя, ведь
+    шапка у каждого своя.
+    """
+    states = [get_scope_state(scope) for scope in scopes]
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    etag = hashlib.md5(
+        f'{view_name}:{states!r}:{user_id}:{request.get_full_path()}'
+        .encode()).hexdigest()
+    changed = [updated for updated, _ in states if updated is not None]
+    last_modified = int(max(changed).timestamp()) if changed else None
+    return quote_etag(etag), last_modified
+
+
+def conditional_page(view_name, get_scope):
+    """Декоратор представления: отвечает 304 на GET-запросы с
+    актуальными If-None-Match или If-Modified-Since и ставит ETag
+    и Last-Modified на полные ответы."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = get_scopes(get_scope, kwargs)
+            if scopes is not None:
+                etag, last_modified = get_validators(
+                    request, view_name, scopes)
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    return response
+            response = view(request, *args, **kwargs)
+            if scopes is None:
+                # Области стали известны при рендеринге (автор поста)
+                scopes = get_scopes(get_scope, kwargs)
+                if scopes is None:
+                    return response
+                etag, last_modified = get_validators(
+                    request, view_name, scopes)
+            if response.status_code == 200 and not read_from_replica(request):
+                response['ETag'] = etag
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,298 @@
+import base64
+import binascii
+import json
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .page_cache import PAGE_CACHE_PREFIX, get_generation
+
+POSTS_PER_PAGE = 10
+# Начиная с этого числа строк точный COUNT(*) заменяется оценкой
+ESTIMATE_THRESHOLD = 10000
+# Дальше этой страницы ?page=N записи не считаются: показывается
+# «больше MAX_COUNTED_PAGES страниц»
+MAX_COUNTED_PAGES = 10000
+# Ключ числа записей содержит поколение области, так что запись
+# поста сама выводит его из оборота; таймаут только чистит кэш
+COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+# Сколько помнить проверенную оценку EstimatedCountPaginator. Ключ
+# содержит MAX(id), поэтому новая запись сама выводит ее из оборота
+ESTIMATE_CACHE_TIMEOUT = 60 * 10
+# Сколько номеров страниц показывать вокруг текущей и по краям
+PAGE_LINKS_ON_EACH_SIDE = 3
+PAGE_LINKS_ON_ENDS = 1
+# Направления перехода, зашитые в курсор
+NEXT = 'n'
+PREVIOUS = 'p'
+# Больше SQLite не хранит: такой id из курсора — OverflowError в базе
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(direction, *key):
+    """Упаковывает направление и ключ записи в непрозрачную строку."""
+    raw = json.dumps([direction, *key])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор в (direction, key). Для пустого или битого
+    курсора возвращает (NEXT, None) — то есть первую страницу."""
+    if not cursor:
+        return NEXT, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, *key = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError):
+        return NEXT, None
+    if direction not in (NEXT, PREVIOUS):
+        return NEXT, None
+    return direction, key
+
+
+def parse_pk(value):
+    """id записи из курсора; ValueError, если в базе такого быть
+    не может."""
+    pk = int(value)
+    if abs(pk) > MAX_PK:
+        raise ValueError(f'id вне диапазона: {pk}')
+    return pk
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает большие таблицы точно.
+
+    Для запроса без фильтров число строк оценивается по MAX(id)
+    (поиск по первичному ключу, без прохода по таблице). Пропуски
+    id (удаления, перенос в архив) завышают оценку, поэтому она
+    проверяется: если строки с номером MAX(id) нет, последняя страница
+    была бы пустой, и строки считаются точно. Результат проверки
+    кэшируется под MAX(id). Точный COUNT(*) выполняется и тогда, когда
+    оценка меньше ESTIMATE_THRESHOLD или к запросу применены фильтры.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where:
+            estimate = self.object_list.model._default_manager.aggregate(
+                max_id=Max('pk'))['max_id'] or 0
+            if estimate >= ESTIMATE_THRESHOLD:
+                return self.check_estimate(estimate)
+        return super().count
+
+    def check_estimate(self, estimate):
+        """estimate, если в таблице не меньше estimate строк (больше
+        быть не может: id уникальны и положительны), иначе COUNT(*)."""
+        key = (
+            f'{PAGE_CACHE_PREFIX}:estimate:'
+            f'{self.object_list.model._meta.label_lower}:{estimate}')
+        count = cache.get(key)
+        if count is None:
+            if self.object_list[estimate - 1:estimate].exists():
+                count = estimate
+            else:
+                count = super().count
+            cache.set(key, count, ESTIMATE_CACHE_TIMEOUT)
+        return count
+
+
+class NumberedPage(Page):
+    """Страница по номеру с сокращенным списком ссылок."""
+
+    @property
+    def page_links(self):
+        """Номера страниц вокруг текущей и по краям; None — пропуск."""
+        number = self.number
+        num_pages = self.paginator.num_pages
+        shown = set(range(1, PAGE_LINKS_ON_ENDS + 1))
+        shown.update(range(
+            max(number - PAGE_LINKS_ON_EACH_SIDE, 1),
+            min(number + PAGE_LINKS_ON_EACH_SIDE, num_pages) + 1))
+        # Последнюю страницу оценки показывать бессмысленно
+        if not self.paginator.is_estimate:
+            shown.update(range(
+                max(num_pages - PAGE_LINKS_ON_ENDS + 1, 1), num_pages + 1))
+        links = []
+        for page in sorted(shown):
+            if links and page - links[-1] > 1:
+                links.append(None)
+            links.append(page)
+        return links
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который не считает строки на каждый запрос.
+
+    Число записей хранится в кэше под поколением области count_scope
+    (posts.page_cache), поэтому новый, измененный или удаленный пост
+    сам делает его устаревшим. Считается не больше MAX_COUNTED_PAGES
+    страниц: COUNT(*) по подзапросу с LIMIT останавливается на
+    границе, а шаблон пишет «больше max_pages страниц».
+    """
+
+    max_pages = MAX_COUNTED_PAGES
+
+    def __init__(self, object_list, per_page, count_scope=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_scope = count_scope
+
+    @property
+    def count_limit(self):
+        return self.max_pages * self.per_page
+
+    def count_rows(self, queryset):
+        """COUNT(*), который останавливается на count_limit + 1."""
+        rows = queryset[:self.count_limit + 1]
+        try:
+            return rows.count()
+        except (AttributeError, TypeError):
+            # Список, а не queryset, как и в Paginator.count
+            return len(rows)
+
+    def get_counts(self):
+        """Слагаемые count; кэшируются вместе."""
+        return (self.count_rows(self.object_list),)
+
+    @cached_property
+    def counts(self):
+        if self.count_scope is None:
+            return self.get_counts()
+        generation = get_generation(self.count_scope)
+        key = (
+            f'{PAGE_CACHE_PREFIX}:count:{self.count_scope}:'
+            f'{self.per_page}:{generation}')
+        counts = cache.get(key)
+        if counts is None:
+            counts = self.get_counts()
+            cache.set(key, counts, COUNT_CACHE_TIMEOUT)
+        return counts
+
+    @cached_property
+    def count(self):
+        return min(sum(self.counts), self.count_limit + 1)
+
+    @property
+    def is_estimate(self):
+        return self.count > self.count_limit
+
+    def _get_page(self, *args, **kwargs):
+        return NumberedPage(*args, **kwargs)
+
+
+class KeysetPage(Page):
+    """Страница, полученная по курсору.
+
+    Номер страницы и общее число страниц неизвестны: вместо них
+    шаблон получает курсоры next_cursor и previous_cursor.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = None
+        self.previous_cursor = None
+        if object_list and has_next:
+            self.next_cursor = paginator.make_cursor(NEXT, object_list[-1])
+        if object_list and has_previous:
+            self.previous_cursor = paginator.make_cursor(
+                PREVIOUS, object_list[0])
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(CachedCountPaginator):
+    """Paginator, который листает ленту по ключу (pub_date, id).
+
+    get_cursor_page() не выполняет ни COUNT(*), ни OFFSET, поэтому
+    любая страница стоит столько же, сколько первая. Обычный
+    get_page() по номеру страницы оставлен для старых ссылок ?page=N.
+    """
+
+    def __init__(self, object_list, per_page=None, **kwargs):
+        if per_page is None:
+            per_page = POSTS_PER_PAGE
+        object_list = object_list.order_by('-pub_date', '-id')
+        super().__init__(object_list, per_page, **kwargs)
+
+    def make_cursor(self, direction, post):
+        return encode_cursor(direction, post.pub_date.isoformat(), post.pk)
+
+    def parse_cursor(self, cursor):
+        """Возвращает (direction, (pub_date, pk)) или (NEXT, None)."""
+        direction, key = decode_cursor(cursor)
+        try:
+            pub_date, pk = key
+            pub_date = parse_datetime(pub_date)
+            pk = parse_pk(pk)
+        except (TypeError, ValueError):
+            return NEXT, None
+        if pub_date is None:
+            return NEXT, None
+        return direction, (pub_date, pk)
+
+    def get_cursor_queryset(self, cursor=None):
+        """Возвращает (direction, key, queryset) для страницы по курсору.
+        queryset уже ограничен per_page + 1 записями."""
+        direction, key = self.parse_cursor(cursor)
+        posts = self.object_list
+        if key is not None:
+            pub_date, pk = key
+            # Условие по одному pub_date позволяет SQLite начать
+            # поиск прямо в индексе, а не просматривать его с начала
+            if direction == NEXT:
+                posts = posts.filter(
+                    Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk),
+                    pub_date__lte=pub_date)
+            else:
+                posts = posts.filter(
+                    Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk),
+                    pub_date__gte=pub_date,
+                ).order_by('pub_date', 'id')
+        # Лишняя запись показывает, есть ли что-то дальше
+        return direction, key, posts[:self.per_page + 1]
+
+    def get_cursor_page(self, cursor=None):
+        direction, key, posts = self.get_cursor_queryset(cursor)
+        return self.build_cursor_page(direction, key, list(posts))
+
+    def build_cursor_page(self, direction, key, object_list):
+        """Собирает страницу из per_page + 1 записей, прочитанных
+        в порядке direction."""
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if direction == PREVIOUS:
+            object_list.reverse()
+            return self._get_keyset_page(
+                object_list, has_next=True, has_previous=has_more)
+        return self._get_keyset_page(
+            object_list, has_next=has_more, has_previous=key is not None)
+
+    def _get_keyset_page(self, *args, **kwargs):
+        return KeysetPage(*args, paginator=self, **kwargs)
+
+
+def get_page_obj(request, post_list, paginator_class=KeysetPaginator,
+                 count_scope=None):
+    """Возвращает страницу ленты для запроса.
+
+    По умолчанию лента листается курсором ?cursor=..., но ссылки
+    вида ?page=N продолжают работать через обычный Paginator;
+    число записей для них кэшируется в области count_scope.
+    """
+    paginator = paginator_class(post_list, count_scope=count_scope)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
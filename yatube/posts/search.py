@@ -0,0 +1,159 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts хранит только токены текста (external content)
+и поддерживается триггерами на posts_post, поэтому в него попадают
+и bulk_create, и правки из админки. Django пересоздает таблицу при
+некоторых миграциях SQLite и теряет триггеры, поэтому
+ensure_search_index() вызывается и после каждого migrate.
+"""
+import re
+
+from django.db import connection, connections, router
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import (
+    NEXT, KeysetPaginator, decode_cursor, encode_cursor, parse_pk)
+
+FTS_TABLE = 'posts_post_fts'
+TRIGGERS = {
+    'posts_post_fts_ai': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_ai
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+    'posts_post_fts_ad': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_ad
+        AFTER DELETE ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+        END''',
+    'posts_post_fts_au': f'''
+        CREATE TRIGGER IF NOT EXISTS posts_post_fts_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+            VALUES ('delete', old.id, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+        END''',
+}
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def ensure_search_index(using=connection):
+    """Создает FTS-таблицу и триггеры, если их нет.
+    Если чего-то не хватало, индекс перестраивается целиком."""
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s) OR "
+            "(type = 'trigger' AND tbl_name = 'posts_post')",
+            ['posts_post', FTS_TABLE],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if 'posts_post' not in existing:
+            return
+        if existing >= {FTS_TABLE, *TRIGGERS}:
+            return
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            "text, content='posts_post', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        for sql in TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(using=connection):
+    if not is_supported(using):
+        return
+    with using.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def to_match_expression(query):
+    """Превращает ввод пользователя в безопасный запрос MATCH:
+    каждое слово ищется по префиксу, все слова обязательны."""
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query))
+
+
+def filter_posts(queryset, query):
+    """Оставляет в queryset только посты, найденные по query."""
+    match = to_match_expression(query)
+    if not match:
+        return queryset.none()
+    if not is_supported():
+        for word in WORD_RE.findall(query):
+            queryset = queryset.filter(text__icontains=word)
+        return queryset
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        (match,),
+    ))
+
+
+class SearchPaginator(KeysetPaginator):
+    """Листает результаты поиска по ключу (rank, id).
+
+    rank — оценка bm25 из FTS5: чем меньше, тем лучше совпадение.
+    Посты загружаются одним запросом id__in только для текущей
+    страницы.
+    """
+
+    def __init__(self, query, post_list=None, **kwargs):
+        if post_list is None:
+            post_list = Post.objects.select_related('author', 'group')
+        super().__init__(post_list, **kwargs)
+        self.match = to_match_expression(query)
+
+    def make_cursor(self, direction, post):
+        return encode_cursor(direction, post.search_rank, post.pk)
+
+    def parse_cursor(self, cursor):
+        direction, key = decode_cursor(cursor)
+        try:
+            rank, pk = float(key[0]), parse_pk(key[1])
+        except (TypeError, ValueError, IndexError):
+            return NEXT, None
+        return direction, (rank, pk)
+
+    def get_cursor_queryset(self, cursor=None):
+        direction, key = self.parse_cursor(cursor)
+        if not self.match or not is_supported():
+            return direction, key, []
+        sql = (
+            f'SELECT id, rank FROM (SELECT rowid AS id, rank '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [self.match]
+        order = 'ASC'
+        if key is not None:
+            rank, pk = key
+            if direction == NEXT:
+                sql += ' WHERE rank > %s OR (rank = %s AND id > %s)'
+            else:
+                sql += ' WHERE rank < %s OR (rank = %s AND id < %s)'
+                order = 'DESC'
+            params += [rank, rank, pk]
+        sql += f' ORDER BY rank {order}, id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        # Индекс читается из той же базы, что и сами посты
+        using = connections[router.db_for_read(Post)]
+        with using.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            ranks = db_cursor.fetchall()
+        posts = self.object_list.in_bulk([pk for pk, _ in ranks])
+        object_list = []
+        for pk, rank in ranks:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                object_list.append(posts[pk])
+        return direction, key, object_list
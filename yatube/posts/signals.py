@@ -0,0 +1,156 @@
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import page_cache, timeline
+from .bulk import refresh_group_activity
+from .forms import GROUP_CHOICES_KEY
+from .models import AuthorStats, ArchivedPost, Group, GroupStats, Post, User
+
+# Поля пользователя, которые видны на страницах лент
+DISPLAYED_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+def change_posts_count(model, pk, delta):
+    """Атомарно меняет posts_count на delta, создавая строку при нужде."""
+    if pk is None:
+        return
+    updated = model.objects.filter(pk=pk).update(
+        posts_count=F('posts_count') + delta)
+    if updated or delta < 0:
+        return
+    _, created = model.objects.get_or_create(
+        pk=pk, defaults={'posts_count': delta})
+    if not created:
+        # Строку успел создать параллельный запрос
+        model.objects.filter(pk=pk).update(
+            posts_count=F('posts_count') + delta)
+
+
+def touch_group_activity(post):
+    """Делает пост последним в его группе, если он не старше
+    прежнего последнего."""
+    if post.group_id is None:
+        return
+    GroupStats.objects.filter(
+        Q(last_pub_date__isnull=True) | Q(last_pub_date__lte=post.pub_date),
+        pk=post.group_id,
+    ).update(last_pub_date=post.pub_date, last_post_id=post.pk)
+
+
+def touch_posts(**lookup):
+    """Отмечает посты измененными, не трогая их текст: на карточках
+    и в лентах видны имя автора и название группы, а валидаторы лент
+    и ключ карточки строятся по updated."""
+    now = timezone.now()
+    for model in (Post, ArchivedPost):
+        model.objects.filter(**lookup).update(updated=now)
+
+
+def invalidate_pages(post, *group_ids):
+    """Сбрасывает кэш страниц, на которых виден пост."""
+    group_ids = [pk for pk in group_ids if pk is not None]
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True) if group_ids else []
+    page_cache.invalidate(
+        page_cache.index_scope(),
+        page_cache.post_scope(post.pk),
+        page_cache.author_scope(post.author_id),
+        page_cache.profile_scope(post.author.username),
+        *[page_cache.group_scope(slug) for slug in slugs],
+        *([page_cache.groups_scope()] if group_ids else []),
+    )
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        change_posts_count(AuthorStats, instance.author_id, 1)
+        change_posts_count(GroupStats, instance.group_id, 1)
+        touch_group_activity(instance)
+        timeline.push_post(instance.pk)
+        invalidate_pages(instance, instance.group_id)
+    else:
+        old_group_id = getattr(
+            instance, '_loaded_group_id', instance.group_id)
+        if old_group_id != instance.group_id:
+            change_posts_count(GroupStats, old_group_id, -1)
+            change_posts_count(GroupStats, instance.group_id, 1)
+            touch_group_activity(instance)
+            if old_group_id is not None:
+                refresh_group_activity([old_group_id])
+        invalidate_pages(instance, old_group_id, instance.group_id)
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_delete(sender, instance, **kwargs):
+    change_posts_count(AuthorStats, instance.author_id, -1)
+    change_posts_count(GroupStats, instance.group_id, -1)
+    if instance.group_id is not None:
+        refresh_group_activity([instance.group_id])
+    timeline.remove_post(instance.pk)
+    invalidate_pages(instance, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def touch_group_posts(sender, instance, created=False, raw=False, **kwargs):
+    """Новое название группы или ее удаление меняет вид ее постов."""
+    if not (raw or created):
+        touch_posts(group=instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, raw=False, **kwargs):
+    cache.delete(GROUP_CHOICES_KEY)
+    if not raw:
+        page_cache.invalidate(
+            page_cache.group_scope(instance.slug),
+            page_cache.groups_scope())
+
+
+def changes_displayed_fields(update_fields):
+    return update_fields is None or bool(
+        DISPLAYED_USER_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    """Запоминает прежнее имя: по нему закэширован старый профиль."""
+    if raw or instance.pk is None:
+        return
+    if changes_displayed_fields(update_fields):
+        instance._old_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, raw=False,
+                            update_fields=None, **kwargs):
+    """Имя автора показано на главной, в его профиле, на страницах
+    его постов и групп, где он писал: их кэш сбрасывается.
+    Вход пользователя (update_fields=['last_login']) ничего не меняет."""
+    if raw or created or not changes_displayed_fields(update_fields):
+        return
+    touch_posts(author=instance)
+    usernames = {instance.username, getattr(instance, '_old_username', None)}
+    slugs = set()
+    for model in (Post, ArchivedPost):
+        slugs.update(
+            model.objects.filter(author=instance, group__isnull=False)
+            .order_by().values_list('group__slug', flat=True).distinct())
+    page_cache.invalidate(
+        page_cache.index_scope(),
+        page_cache.groups_scope(),
+        page_cache.author_scope(instance.pk),
+        *[page_cache.profile_scope(name) for name in usernames if name],
+        *[page_cache.group_scope(slug) for slug in slugs],
+    )
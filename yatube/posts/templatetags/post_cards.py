@@ -0,0 +1,51 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+register = template.Library()
+
+# Увеличьте, если поменялась разметка карточки
+POST_CARD_VERSION = 1
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+
+def post_card_key(post):
+    """Ключ карточки: id и время правки поста плюс все, что карточка
+    показывает не из самого поста (имя автора, группа, язык)."""
+    extra = '|'.join((
+        post.author.get_full_name(),
+        post.author.username,
+        post.group.slug if post.group_id else '',
+        get_language() or '',
+    ))
+    return 'post_card:{}:{}:{}:{}'.format(
+        POST_CARD_VERSION,
+        post.pk,
+        post.updated.timestamp(),
+        hashlib.md5(extra.encode()).hexdigest(),
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Возвращает отрендеренные карточки постов.
+
+    Готовые карточки берутся из кэша одним get_many,
+    рендерятся только новые и измененные посты.
+    """
+    posts = list(posts)
+    keys = [post_card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(
+                'posts/includes/post_card.html', {'post': post})
+    if missing:
+        cache.set_many(missing, POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='password')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.user)
+
+    def count_changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(
+                reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def create_posts(self, number):
+        for i in range(number):
+            Post.objects.create(
+                author=self.user,
+                text=f'Пост {i}',
+                group=self.groups[i % len(self.groups)],
+            )
+
+    def test_changelist_queries_do_not_grow(self):
+        """Число запросов списка постов не зависит от числа строк"""
+        self.create_posts(2)
+        self.count_changelist_queries()
+        few_rows = self.count_changelist_queries()
+        self.create_posts(20)
+        self.assertEqual(self.count_changelist_queries(), few_rows)
+
+    def test_big_table_count_is_estimated(self):
+        """Для большой таблицы COUNT(*) заменяется оценкой"""
+        self.create_posts(3)
+        with mock.patch('posts.paginators.ESTIMATE_THRESHOLD', 2):
+            with CaptureQueriesContext(connection) as queries:
+                self.admin_client.get(reverse('admin:posts_post_changelist'))
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(*)', query['sql'].upper())
@@ -0,0 +1,148 @@
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import (
+    ARCHIVE_BOUNDARY_KEY, ARCHIVE_BOUNDARY_TIMEOUT, archive_posts)
+from posts.bulk import bulk_create_posts, recount
+from posts.models import ArchivedPost, AuthorStats, Group, GroupStats, Post
+
+User = get_user_model()
+
+START = timezone.make_aware(datetime(2020, 1, 1, 12))
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='old')
+        cls.group = Group.objects.create(
+            title='Группа', slug='archive', description='Описание')
+        # Пары постов с одинаковой датой проверяют ключ (pub_date, id)
+        bulk_create_posts([
+            Post(
+                text=f'Пост {i}', author=cls.author, group=cls.group,
+                pub_date=START + timedelta(days=i // 2))
+            for i in range(25)
+        ])
+        recount(AuthorStats, 'author')
+        recount(GroupStats, 'group')
+        cls.cutoff = START + timedelta(days=6, hours=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_expected_ids(self):
+        return list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('id', flat=True))
+
+    def walk(self, url):
+        """Id постов на всех страницах ленты по курсору, вперед и назад"""
+        ids = []
+        pages = []
+        response = self.client.get(url)
+        while True:
+            page = response.context['page_obj']
+            pages.append([post.pk for post in page])
+            ids += pages[-1]
+            if not page.has_next():
+                break
+            response = self.client.get(f'{url}?cursor={page.next_cursor}')
+        back = [pages[-1]]
+        while page.has_previous():
+            response = self.client.get(
+                f'{url}?cursor={page.previous_cursor}')
+            page = response.context['page_obj']
+            back.append([post.pk for post in page])
+        self.assertEqual(back[::-1], pages)
+        return ids
+
+    def test_archive_moves_old_posts(self):
+        """Команда переносит старые посты и не трогает счетчики"""
+        out = StringIO()
+        call_command(
+            'archive_posts', f'--before={self.cutoff.isoformat()}',
+            '--batch-size=5', stdout=out)
+        self.assertIn('перенесено постов: 14', out.getvalue())
+        self.assertEqual(ArchivedPost.objects.count(), 14)
+        self.assertEqual(Post.objects.count(), 11)
+        self.assertFalse(
+            Post.objects.filter(pub_date__lt=self.cutoff).exists())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).posts_count, 25)
+        self.assertEqual(recount(AuthorStats, 'author'), 0)
+        self.assertEqual(recount(GroupStats, 'group'), 0)
+
+    def test_feeds_fall_through_to_archive(self):
+        """Профиль и группа листаются через границу архива"""
+        expected = self.get_expected_ids()
+        archive_posts(self.cutoff, batch_size=4)
+        for url in (
+            reverse('posts:profile', args=['old']),
+            reverse('posts:group_list', args=['archive']),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url), expected)
+
+    def test_numbered_pages_fall_through_to_archive(self):
+        """Старые ссылки ?page=N тоже видят архив"""
+        expected = self.get_expected_ids()
+        archive_posts(self.cutoff)
+        url = reverse('posts:profile', args=['old'])
+        ids = []
+        for number in (1, 2, 3):
+            page = self.client.get(url, {'page': number}).context['page_obj']
+            ids += [post.pk for post in page]
+        self.assertEqual(ids, expected)
+        self.assertEqual(page.paginator.count, 25)
+
+    def test_archived_post_detail(self):
+        """Архивный пост открывается по старому id без кнопки правки"""
+        post = Post.objects.order_by('pub_date').first()
+        archive_posts(self.cutoff)
+        author_client = Client()
+        author_client.force_login(self.author)
+        response = author_client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['posts'].is_archived)
+        self.assertNotContains(
+            response, reverse('posts:post_edit', args=[post.pk]))
+        response = author_client.get(
+            reverse('posts:post_detail', args=[10 ** 6]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stale_boundary(self):
+        """Процесс с устаревшей границей (архивация шла в другом
+        процессе) открывает архивный пост и скоро видит архив в лентах"""
+        post = Post.objects.order_by('pub_date').first()
+        expected = self.get_expected_ids()
+        url = reverse('posts:profile', args=['old'])
+        archive_posts(self.cutoff)
+        cache.set(ARCHIVE_BOUNDARY_KEY, (None,), ARCHIVE_BOUNDARY_TIMEOUT)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        later = time.time() + ARCHIVE_BOUNDARY_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.walk(url), expected)
+
+    def test_no_archive_queries_while_archive_is_empty(self):
+        """Пока архив пуст, страница поста читает только Post"""
+        post = Post.objects.first()
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
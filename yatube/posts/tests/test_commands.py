@@ -0,0 +1,177 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.bulk import LookupCache, import_posts
+from posts.models import AuthorStats, Group, GroupStats, Post
+
+User = get_user_model()
+
+
+class CheckFeedPlansCommandTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам, без сортировки в B-дереве"""
+        out = StringIO()
+        call_command('check_feed_plans', stdout=out)
+        self.assertIn('post_feed_idx', out.getvalue())
+        self.assertNotIn('TEMP B-TREE', out.getvalue())
+
+
+class RecountPostsCommandTest(TestCase):
+    def test_recount_repairs_drift(self):
+        """recount_posts возвращает счетчикам верные значения"""
+        user = User.objects.create_user(username='drift')
+        group = Group.objects.create(
+            title='Группа', slug='drift', description='Описание')
+        Post.objects.create(author=user, text='Пост', group=group)
+        AuthorStats.objects.filter(author=user).update(posts_count=7)
+        GroupStats.objects.filter(group=group).delete()
+        call_command('recount_posts', stdout=StringIO())
+        self.assertEqual(user.post_stats.posts_count, 1)
+        self.assertEqual(GroupStats.objects.get(group=group).posts_count, 1)
+
+
+class ImportPostsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='importer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='import', description='Описание')
+
+    def import_file(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile(
+                'w', suffix=suffix, encoding='utf-8', delete=False) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_posts', file.name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_jsonl(self):
+        """JSONL загружается пачками, даты и группы сохраняются"""
+        lines = [
+            json.dumps({
+                'text': f'Пост {i}',
+                'author': 'importer',
+                'group': 'import' if i % 2 else '',
+                'pub_date': f'2020-01-0{i + 1}T12:00:00+00:00',
+            })
+            for i in range(5)
+        ]
+        out, err = self.import_file(
+            '\n'.join(lines), '.jsonl', '--chunk-size=2', '--batch-size=1')
+        self.assertIn('Загружено постов: 5', out)
+        self.assertEqual(err, '')
+        first = Post.objects.get(text='Пост 0')
+        self.assertEqual(first.pub_date.year, 2020)
+        self.assertIsNone(first.group)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 5)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count, 2)
+
+    def test_import_csv_skips_bad_rows(self):
+        """Строки с неизвестным автором или группой пропускаются"""
+        content = (
+            'text,author,group\n'
+            'Хороший пост,importer,import\n'
+            'Чужой пост,nobody,\n'
+            'Пост без группы,importer,missing\n'
+        )
+        out, err = self.import_file(content, '.csv')
+        self.assertIn('Загружено постов: 1, пропущено: 2', out)
+        self.assertIn("нет автора 'nobody'", err)
+        self.assertIn("нет группы 'missing'", err)
+        self.assertTrue(Post.objects.filter(text='Хороший пост').exists())
+
+    def test_import_skips_malformed_records(self):
+        """Поля не того типа и несуществующие даты пропускаются
+        с номером записи, а не обрывают импорт"""
+        records = [
+            {'text': 5, 'author': 'importer'},
+            {'text': 'Пост', 'author': ['importer']},
+            {'text': 'Пост', 'author': 'importer', 'pub_date': 12},
+            {'text': 'Пост', 'author': 'importer',
+             'pub_date': '2020-02-30T00:00:00'},
+            ['не словарь'],
+            {'text': 'Хороший пост', 'author': 'importer'},
+        ]
+        errors = []
+        created, skipped = import_posts(
+            records, on_error=lambda number, error: errors.append(number))
+        self.assertEqual((created, skipped), (1, 5))
+        self.assertEqual(errors, [1, 2, 3, 4, 5])
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 1)
+
+    def test_failed_import_refreshes_committed_chunks(self):
+        """Если импорт оборвался, счетчики уже загруженных пачек
+        все равно пересчитываются"""
+        def records():
+            yield {'text': 'Первый', 'author': 'importer'}
+            yield {'text': 'Второй', 'author': 'importer'}
+            raise OSError('файл недочитан')
+
+        with self.assertRaises(OSError):
+            import_posts(records(), chunk_size=1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 2)
+
+    def test_lookup_cache_queries_once_per_chunk(self):
+        """Авторы одной пачки ищутся одним запросом, найденные
+        и ненайденные ключи повторно не запрашиваются"""
+        records = [{'text': f'Пост {i}', 'author': 'importer'}
+                   for i in range(20)]
+        cache = LookupCache(User.objects.all(), 'username')
+        with self.assertNumQueries(1):
+            cache.load(record['author'] for record in records)
+        with self.assertNumQueries(1):
+            cache.load(['importer', 'nobody'])
+        with self.assertNumQueries(0):
+            cache.load(['importer', 'nobody'])
+        self.assertEqual(cache.get('importer'), self.user.pk)
+        self.assertIsNone(cache.get('nobody'))
+
+    def test_lookup_cache_overflow_keeps_chunk_keys(self):
+        """Переполненный кэш сбрасывается, но ключи текущей пачки,
+        найденные раньше, остаются в нем"""
+        for i in range(5):
+            User.objects.create_user(username=f'u{i}')
+        records = [{'text': f'Пост {i}', 'author': f'u{i}'}
+                   for i in range(5)]
+        cache = LookupCache(User.objects.all(), 'username', max_size=4)
+        cache.load(['u0', 'u1'])
+        cache.load(record['author'] for record in records)
+        for record in records:
+            self.assertIsNotNone(cache.get(record['author']))
+        with mock.patch('posts.bulk.LOOKUP_CACHE_SIZE', 4):
+            created, skipped = import_posts(records + records, chunk_size=5)
+        self.assertEqual((created, skipped), (10, 0))
+
+    def test_import_keeps_model_field_intact(self):
+        """Импорт сохраняет даты источника, не отключая auto_now_add
+        у поля модели: save() во время импорта ставит текущее время"""
+        field = Post._meta.get_field('pub_date')
+        states = []
+
+        def on_chunk(created):
+            states.append(field.auto_now_add)
+            post = Post.objects.create(author=self.user, text='Живой пост')
+            self.assertIsNotNone(post.pub_date)
+
+        records = [{'text': 'Старый пост', 'author': 'importer',
+                    'pub_date': '2019-05-01T10:00:00+00:00'}]
+        import_posts(records, on_chunk=on_chunk)
+        self.assertEqual(states, [True])
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.pub_date.year, 2019)
+        self.assertIsNotNone(post.updated)
@@ -0,0 +1,120 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.archive import archive_posts
+from posts.bulk import bulk_create_posts
+from posts.export import export_posts, get_export_queryset, iter_rows
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.other = User.objects.create_user(username='other')
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='export', description='Описание')
+        start = timezone.make_aware(datetime(2021, 1, 1, 12))
+        # Часть постов с одинаковой датой: ключ (pub_date, id)
+        # должен различать их на границе пачки
+        bulk_create_posts([
+            Post(
+                text=f'Пост {i}',
+                author=cls.author if i % 2 else cls.other,
+                group=cls.group if i % 3 == 0 else None,
+                pub_date=start + timedelta(days=i // 2),
+            )
+            for i in range(9)
+        ])
+
+    def setUp(self):
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_rows_are_chunked_by_key(self):
+        """Пачки по ключу отдают каждый пост ровно один раз"""
+        expected = list(Post.objects.order_by(
+            'pub_date', 'id').values_list('id', flat=True))
+        with self.assertNumQueries(5):
+            ids = [row['id'] for row in iter_rows(Post.objects.all(), 2)]
+        self.assertEqual(ids, expected)
+
+    def test_filters(self):
+        """Выгрузка фильтруется по автору, группе и периоду"""
+        posts = get_export_queryset(
+            author='writer', since='2021-01-02', until='2021-01-04')
+        self.assertEqual(
+            sorted(posts.values_list('text', flat=True)),
+            ['Пост 3', 'Пост 5'])
+        posts = get_export_queryset(group='export')
+        self.assertEqual(posts.count(), 3)
+
+    def test_ndjson_endpoint_streams_posts(self):
+        """Сотрудник получает NDJSON потоком"""
+        response = self.staff_client.get(
+            reverse('posts:export'), {'author': 'other'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [
+            json.loads(line)
+            for line in b''.join(response.streaming_content)
+            .decode().splitlines()
+        ]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['author'], 'other')
+        self.assertEqual(rows[0]['group'], 'export')
+        self.assertEqual(rows[0]['text'], 'Пост 0')
+
+    def test_endpoint_rejects_bad_params(self):
+        """Неверные формат и дата дают 400, аноним уходит на вход"""
+        url = reverse('posts:export')
+        for params in ({'format': 'xml'}, {'since': 'вчера'},
+                       {'since': '2020-02-30'},
+                       {'until': '2020-01-01T25:00:00'}):
+            with self.subTest(params=params):
+                response = self.staff_client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Client().get(url).status_code, 302)
+
+    def test_command_writes_csv(self):
+        """Команда export_posts пишет CSV с заголовком"""
+        out = StringIO()
+        call_command(
+            'export_posts', '--format=csv', '--group=export',
+            '--chunk-size=1', stdout=out)
+        rows = list(csv.DictReader(StringIO(out.getvalue())))
+        self.assertEqual(
+            [row['text'] for row in rows], ['Пост 0', 'Пост 3', 'Пост 6'])
+        self.assertEqual(rows[0]['author'], 'other')
+
+    def test_export_includes_archive(self):
+        """Архивные посты выгружаются вместе с остальными в общем
+        порядке (pub_date, id)"""
+        expected = list(Post.objects.order_by(
+            'pub_date', 'id').values_list('text', flat=True))
+        archive_posts(timezone.make_aware(datetime(2021, 1, 3)))
+        out = StringIO()
+        call_command('export_posts', '--chunk-size=2', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['text'] for row in rows], expected)
+
+    def test_csv_rows_match_ndjson(self):
+        """Оба формата выгружают одни и те же посты"""
+        posts = Post.objects.all()
+        ndjson = list(export_posts(posts, 'ndjson'))
+        csv_lines = list(export_posts(posts, 'csv'))
+        self.assertEqual(len(csv_lines), len(ndjson) + 1)
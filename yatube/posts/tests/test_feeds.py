@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='reader', first_name='Читатель', last_name='Лент')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание группы')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост для читалок')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_feed_urls(self):
+        return {
+            'posts:index_rss': reverse('posts:index_rss'),
+            'posts:index_atom': reverse('posts:index_atom'),
+            'posts:group_rss': reverse('posts:group_rss', args=['feeds']),
+            'posts:group_atom': reverse('posts:group_atom', args=['feeds']),
+            'posts:profile_rss': reverse(
+                'posts:profile_rss', args=['reader']),
+            'posts:profile_atom': reverse(
+                'posts:profile_atom', args=['reader']),
+        }
+
+    def test_feeds_contain_posts(self):
+        """Все ленты отдают пост с заголовками для условного GET"""
+        for name, url in self.get_feed_urls().items():
+            with self.subTest(name=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Пост для читалок', response.content.decode())
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_not_modified(self):
+        """Повторный опрос с ETag или датой получает 304 одним запросом"""
+        url = reverse('posts:group_rss', args=['feeds'])
+        response = self.client.get(url)
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                with self.assertNumQueries(1):
+                    cached = self.client.get(url, **headers)
+                self.assertEqual(cached.status_code, 304)
+
+    def test_body_is_cached_until_new_post(self):
+        """Тело ленты берется из кэша, пока не появится новый пост"""
+        url = reverse('posts:index_atom')
+        response = self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertIn('Свежий пост', fresh.content.decode())
+
+    def test_edit_changes_etag(self):
+        """Правка поста меняет ETag ленты автора"""
+        url = reverse('posts:profile_rss', args=['reader'])
+        etag = self.client.get(url)['ETag']
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Исправленный пост', response.content.decode())
+
+    def test_unknown_group_feed(self):
+        """Лента несуществующей группы отвечает 404"""
+        response = self.client.get(
+            reverse('posts:group_rss', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_validators_come_from_data(self):
+        """Без изменений валидаторы те же и после сброса кэша (как
+        в другом процессе); удаление поста и новое имя автора их
+        меняют"""
+        url = reverse('posts:profile_rss', args=['reader'])
+        response = self.client.get(url)
+        cache.clear()
+        again = self.client.get(url)
+        self.assertEqual(again['ETag'], response['ETag'])
+        self.assertEqual(again['Last-Modified'], response['Last-Modified'])
+        extra = Post.objects.create(author=self.user, text='Лишний пост')
+        etag = self.client.get(url)['ETag']
+        extra.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Писатель'
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Писатель', response.content.decode())
@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import page_cache
+from posts.archive import archive_posts
+from posts.bulk import refresh_group_activity
+from posts.models import Group, GroupStats, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class GroupIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Автор', last_name='Групп')
+        cls.quiet = Group.objects.create(
+            title='Тихая', slug='quiet', description='Описание')
+        cls.busy = Group.objects.create(
+            title='Активная', slug='busy', description='Описание')
+        cls.empty = Group.objects.create(
+            title='Пустая', slug='empty', description='Описание')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def create_post(self, group, text='Пост'):
+        return Post.objects.create(author=self.author, group=group, text=text)
+
+    def test_new_post_becomes_last(self):
+        """Новый пост становится последним в своей группе"""
+        self.create_post(self.busy)
+        post = self.create_post(self.busy, 'Свежий')
+        stats = self.get_stats(self.busy)
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.last_post_id, post.pk)
+        self.assertEqual(stats.last_pub_date, post.pub_date)
+
+    def test_delete_and_move_refresh_last_post(self):
+        """Удаление и перенос поста находят предыдущий последний пост"""
+        first = self.create_post(self.busy, 'Первый')
+        second = self.create_post(self.busy, 'Второй')
+        second.delete()
+        self.assertEqual(self.get_stats(self.busy).last_post_id, first.pk)
+        first = Post.objects.get(pk=first.pk)
+        first.group = self.quiet
+        first.save()
+        stats = self.get_stats(self.busy)
+        self.assertIsNone(stats.last_post_id)
+        self.assertIsNone(stats.last_pub_date)
+        self.assertEqual(self.get_stats(self.quiet).last_post_id, first.pk)
+
+    def test_archive_keeps_last_activity(self):
+        """После архивации остается дата активности, но не ссылка"""
+        post = self.create_post(self.quiet)
+        archive_posts(timezone.now() + timedelta(seconds=1))
+        stats = self.get_stats(self.quiet)
+        self.assertIsNone(stats.last_post_id)
+        self.assertEqual(stats.last_pub_date, post.pub_date)
+        refresh_group_activity()
+        self.assertEqual(
+            self.get_stats(self.quiet).last_pub_date, post.pub_date)
+
+    def test_refresh_matches_signals(self):
+        """Пересчет дает те же данные, что сигналы"""
+        self.create_post(self.quiet)
+        self.create_post(self.busy)
+        expected = list(GroupStats.objects.order_by('pk').values())
+        GroupStats.objects.update(last_post=None, last_pub_date=None)
+        refresh_group_activity()
+        self.assertEqual(
+            list(GroupStats.objects.order_by('pk').values()), expected)
+
+    def test_directory_page(self):
+        """Каталог показывает группы от активных к пустым одним запросом"""
+        self.create_post(self.quiet, 'Тихий пост')
+        self.create_post(self.busy, 'Активный пост')
+        url = reverse('posts:groups')
+        # Состояние области для ETag считается раз на поколение
+        page_cache.get_scope_state(page_cache.groups_scope())
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(
+            list(response.context['groups']),
+            [self.busy, self.quiet, self.empty])
+        self.assertContains(response, 'Активный пост')
+        self.assertContains(response, 'Постов: 1')
+        self.assertContains(response, 'постов пока нет')
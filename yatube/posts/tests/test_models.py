@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, GroupStats, Post
 
 User = get_user_model()
 
@@ -42,3 +42,41 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).verbose_name, expected_value)
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Первая группа',
+            slug='first',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Вторая группа',
+            slug='second',
+            description='Тестовое описание',
+        )
+
+    def get_counts(self):
+        return (
+            AuthorStats.objects.get(author=self.user).posts_count,
+            GroupStats.objects.get(group=self.group).posts_count,
+            GroupStats.objects.filter(group=self.group_2).values_list(
+                'posts_count', flat=True).first() or 0,
+        )
+
+    def test_counters_follow_post_changes(self):
+        """Счетчики меняются при создании, смене группы и удалении поста"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group)
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        self.assertEqual(self.get_counts(), (2, 2, 0))
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group_2
+        post.save()
+        self.assertEqual(self.get_counts(), (2, 1, 1))
+        post.delete()
+        self.assertEqual(self.get_counts(), (1, 1, 0))
@@ -0,0 +1,235 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import page_cache
+from posts.bulk import bulk_create_posts
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cached')
+        cls.other_user = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='cached-group',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Первый пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_page_is_cached(self):
+        """Повторный запрос анонима отдается из кэша без запросов к БД"""
+        url = reverse('posts:group_list', kwargs={'slug': 'cached-group'})
+        first = self.guest_client.get(url)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(
+            page_cache.get_stats()['posts:group_list'], (1, 1))
+
+    def test_authorized_page_is_not_cached(self):
+        """Авторизованный пользователь всегда получает свежую страницу"""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(page_cache.get_stats()['posts:index'], (0, 0))
+
+    def test_post_edit_invalidates_affected_pages(self):
+        """Правка поста сбрасывает только страницы, где он виден"""
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        other_url = reverse('posts:profile', kwargs={'username': 'other'})
+        self.guest_client.get(post_url)
+        self.guest_client.get(other_url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        response = self.guest_client.get(post_url)
+        self.assertContains(response, 'Новый текст')
+        self.guest_client.get(other_url)
+        self.assertEqual(
+            page_cache.get_stats()['posts:post_detail'], (0, 2))
+        self.assertEqual(page_cache.get_stats()['posts:profile'], (1, 1))
+
+    def test_unknown_query_params_share_the_page(self):
+        """Посторонние параметры строки запроса не плодят копий
+        страницы в кэше"""
+        url = reverse('posts:index')
+        self.guest_client.get(url, {'utm': 'a'})
+        with self.assertNumQueries(0):
+            self.guest_client.get(url, {'utm': 'b'})
+        self.guest_client.get(url, {'page': 1})
+        self.assertEqual(page_cache.get_stats()['posts:index'], (1, 2))
+
+    def test_new_post_refreshes_author_count_on_post_page(self):
+        """Новый пост автора сбрасывает страницы его старых постов:
+        на них показано число постов автора"""
+        post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(post_url)
+        self.guest_client.get(post_url)
+        Post.objects.create(author=self.user, text='Второй пост')
+        response = self.guest_client.get(post_url)
+        self.assertEqual(
+            response.context['posts'].author.post_stats.posts_count, 2)
+
+    def test_stats_command(self):
+        """page_cache_stats печатает долю попаданий"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.guest_client.get(url)
+        out = StringIO()
+        call_command('page_cache_stats', '--reset', stdout=out)
+        self.assertIn('50.0%', out.getvalue())
+        self.assertEqual(page_cache.get_stats()['posts:index'], (0, 0))
+
+
+class ConditionalPageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='validator')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'conditional'}),
+            reverse('posts:profile', kwargs={'username': 'validator'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменившаяся страница отвечает 304 без запросов к БД"""
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                for headers in (
+                    {'HTTP_IF_NONE_MATCH': response['ETag']},
+                    {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+                ):
+                    with self.assertNumQueries(0):
+                        cached = self.guest_client.get(url, **headers)
+                    self.assertEqual(cached.status_code, 304)
+
+    def test_edit_changes_validators(self):
+        """Правка поста меняет ETag его страницы"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст', 'group': self.group.pk},
+        )
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новый текст')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_new_post_changes_validators_of_author_posts(self):
+        """Новый пост автора меняет ETag страниц его постов:
+        на них показано число постов автора"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='Второй пост')
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.context['posts'].author.post_stats.posts_count, 2)
+
+    def test_rename_changes_validators(self):
+        """Новое имя автора меняет ETag страниц, где оно показано"""
+        etags = {url: self.guest_client.get(url)['ETag']
+                 for url in self.get_urls()}
+        self.user.username = 'renamed'
+        self.user.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertNotEqual(response.status_code, 304)
+
+    def test_login_keeps_validators(self):
+        """Вход пользователя не сбрасывает страницы"""
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        self.user.save(update_fields=['last_login'])
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_generations_expire(self):
+        """После GENERATION_TIMEOUT неизменившаяся страница все так же
+        отвечает 304, а запись мимо сигналов этого процесса видна"""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        later = time.time() + page_cache.GENERATION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            cached = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        bulk_create_posts([Post(author=self.user, text='Мимо сигналов')])
+        later += page_cache.GENERATION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            fresh = self.guest_client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_validators_do_not_depend_on_process(self):
+        """Другой процесс со своим кэшем отдает те же валидаторы"""
+        for url in self.get_urls():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                cache.clear()
+                again = self.guest_client.get(url)
+                self.assertEqual(again['ETag'], response['ETag'])
+                self.assertEqual(
+                    again['Last-Modified'], response['Last-Modified'])
+
+    def test_delete_changes_validators(self):
+        """Удаление поста меняет ETag главной и профиля"""
+        extra = Post.objects.create(author=self.user, text='Лишний')
+        urls = self.get_urls()[0], self.get_urls()[2]
+        etags = {url: self.guest_client.get(url)['ETag'] for url in urls}
+        extra.delete()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Аноним и автор получают разные ETag одной страницы"""
+        url = reverse('posts:index')
+        anonymous = self.guest_client.get(url)
+        response = self.authorized_client.get(
+            url, HTTP_IF_NONE_MATCH=anonymous['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertIn('Cookie', response['Vary'])
@@ -0,0 +1,97 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+from posts.page_cache import profile_scope
+from posts.paginators import CachedCountPaginator, EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class SmallPaginator(CachedCountPaginator):
+    max_pages = 2
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted')
+        Post.objects.bulk_create([
+            Post(author=cls.author, text=f'Пост {i}') for i in range(7)])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_paginator(self, paginator_class=CachedCountPaginator, **kwargs):
+        return paginator_class(
+            Post.objects.order_by('-id'), 2,
+            count_scope=profile_scope('counted'), **kwargs)
+
+    def test_count_is_cached_until_write(self):
+        """Число постов берется из кэша, пока не появится новый пост"""
+        self.assertEqual(self.get_paginator().count, 7)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_paginator().count, 7)
+        Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.get_paginator().count, 8)
+
+    def test_large_sets_are_estimated(self):
+        """Строки считаются только до границы max_pages"""
+        paginator = self.get_paginator(SmallPaginator)
+        self.assertEqual(paginator.count, 5)
+        self.assertTrue(paginator.is_estimate)
+        self.assertEqual(paginator.num_pages, 3)
+        self.assertFalse(self.get_paginator().is_estimate)
+
+    def test_page_links(self):
+        """Ссылки показывают края и соседей текущей страницы"""
+        paginator = CachedCountPaginator(list(range(100)), 2)
+        self.assertEqual(
+            paginator.page(25).page_links,
+            [1, None, 22, 23, 24, 25, 26, 27, 28, None, 50])
+        self.assertEqual(
+            paginator.page(1).page_links, [1, 2, 3, 4, None, 50])
+
+    def test_numbered_page_view(self):
+        """Страница ?page=N не считает посты повторно"""
+        client = Client()
+        url = reverse('posts:profile', args=['counted'])
+        client.get(url, {'page': 1})
+        with self.assertNumQueries(2):
+            response = client.get(url, {'page': 1})
+        self.assertEqual(response.context['page_obj'].paginator.count, 7)
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='estimated')
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Пост {i}') for i in range(30)])
+
+    def setUp(self):
+        cache.clear()
+
+    def get_count(self):
+        with mock.patch('posts.paginators.ESTIMATE_THRESHOLD', 10):
+            return EstimatedCountPaginator(Post.objects.all(), 10).count
+
+    def test_estimate_without_gaps(self):
+        """Без пропусков id оценка совпадает с числом строк"""
+        self.assertEqual(self.get_count(), 30)
+
+    def test_gaps_in_ids_are_not_counted(self):
+        """Удаленные id не дают лишних пустых страниц"""
+        ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+        Post.objects.filter(id__in=ids[5:20]).delete()
+        cache.clear()
+        self.assertEqual(self.get_count(), 15)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_count(), 15)
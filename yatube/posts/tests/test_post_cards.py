@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card')
+        cls.post = Post.objects.create(author=cls.user, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_card_rendered_once(self):
+        """Карточка рендерится один раз и дальше берется из кэша"""
+        url = reverse('posts:index')
+        response = self.authorized_client.get(url)
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        response = self.authorized_client.get(url)
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Карточка')
+
+    def test_edited_card_rendered_again(self):
+        """После правки поста карточка рендерится заново"""
+        url = reverse('posts:profile', kwargs={'username': 'card'})
+        self.authorized_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новая карточка'},
+        )
+        response = self.authorized_client.get(url)
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Новая карточка')
@@ -0,0 +1,120 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import (
+    QueryBudgetExceeded, count_queries, get_budget, query_budget)
+from posts.models import Group, Post
+
+User = get_user_model()
+
+CACHE_DIR = tempfile.mkdtemp()
+# Бюджеты рассчитаны на общий для процессов кэш: только с ним
+# сессия и пользователь читаются из кэша
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+}
+
+
+@override_settings(
+    PAGE_CACHE_TIMEOUT=0, CACHES=SHARED_CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class ViewQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='budget', first_name='Бюджет', last_name='Запросов')
+        cls.group = Group.objects.create(
+            title='Группа', slug='budget', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост про котиков', group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def get_pages(self):
+        """(имя URL, адрес, нужна ли авторизация) для всех posts.views"""
+        return (
+            ('posts:index', reverse('posts:index'), False),
+            ('posts:group_list',
+             reverse('posts:group_list', kwargs={'slug': 'budget'}), False),
+            ('posts:groups', reverse('posts:groups'), False),
+            ('posts:profile',
+             reverse('posts:profile', kwargs={'username': 'budget'}), False),
+            ('posts:post_detail',
+             reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+             False),
+            ('posts:search', reverse('posts:search'), False),
+            ('posts:post_create', reverse('posts:post_create'), True),
+            ('posts:post_edit',
+             reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+             True),
+        )
+
+    def assert_pages_within_budget(self):
+        for view_name, url, authenticated in self.get_pages():
+            client = self.author_client if authenticated else self.guest_client
+            budget = get_budget(view_name, authenticated)
+            data = {'q': 'котик'} if view_name == 'posts:search' else {}
+            with self.subTest(view_name=view_name):
+                # Первый запрос прогревает буфер главной и список групп
+                first_page = client.get(url, data).context.get('page_obj')
+                with count_queries() as counter:
+                    client.get(url, data)
+                self.assertEqual(counter.count, budget, counter.statements)
+                if first_page is None or not first_page.has_next():
+                    continue
+                data['cursor'] = first_page.next_cursor
+                with count_queries() as counter:
+                    client.get(url, data)
+                self.assertEqual(counter.count, budget, counter.statements)
+
+    def test_budget_does_not_depend_on_posts_count(self):
+        """Число запросов не растет вместе с числом постов"""
+        self.assert_pages_within_budget()
+        for i in range(25):
+            Post.objects.create(
+                author=self.user, text=f'Котик {i}', group=self.group)
+        self.assert_pages_within_budget()
+
+    def test_budget_does_not_depend_on_page_size(self):
+        """Число запросов не зависит от размера страницы"""
+        for i in range(12):
+            Post.objects.create(
+                author=self.user, text=f'Котик {i}', group=self.group)
+        with mock.patch('posts.paginators.POSTS_PER_PAGE', 3):
+            self.assert_pages_within_budget()
+
+
+class QueryBudgetTest(TestCase):
+    def test_budget_exceeded(self):
+        """query_budget падает при превышении лимита"""
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                list(Post.objects.all())
+                list(Group.objects.all())
+
+    def test_budget_as_decorator(self):
+        """query_budget работает как декоратор"""
+        @query_budget(1)
+        def load_posts():
+            return list(Post.objects.all())
+
+        self.assertEqual(load_posts(), [])
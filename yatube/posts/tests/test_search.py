@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import NEXT, encode_cursor
+from posts.search import filter_posts
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_superuser(
+            username='searcher', email='searcher@example.com',
+            password='password')
+        for i in range(12):
+            Post.objects.create(author=cls.user, text=f'Котики номер {i}')
+        cls.dog_post = Post.objects.create(
+            author=cls.user, text='Собака "без" кавычек')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_search_finds_by_prefix(self):
+        """Поиск находит пост по началу слова"""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'собак'})
+        self.assertEqual(list(response.context['page_obj']), [self.dog_post])
+
+    def test_search_pages_by_cursor(self):
+        """Результаты поиска листаются курсором, не теряя запрос"""
+        url = reverse('posts:search')
+        first_page = self.guest_client.get(
+            url, {'q': 'котики'}).context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        second_page = self.guest_client.get(
+            url, {'q': 'котики', 'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), 2)
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_cursor_with_huge_id_shows_first_page(self):
+        """Курсор с id больше 64 бит открывает первую страницу"""
+        response = self.guest_client.get(
+            reverse('posts:search'),
+            {'q': 'котики', 'cursor': encode_cursor(NEXT, 1.0, 10 ** 30)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста"""
+        post = Post.objects.get(pk=self.dog_post.pk)
+        post.text = 'Кошка'
+        post.save()
+        self.assertFalse(filter_posts(Post.objects.all(), 'собака').exists())
+        self.assertTrue(filter_posts(Post.objects.all(), 'кошка').exists())
+        post.delete()
+        self.assertFalse(filter_posts(Post.objects.all(), 'кошка').exists())
+
+    def test_syntax_in_query_is_ignored(self):
+        """Кавычки и операторы FTS в запросе не ломают поиск"""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': '"без) OR NEAR('})
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет через индекс FTS5"""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -1,9 +1,18 @@
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django import forms
 
 from posts.models import Post, Group
+from posts.paginators import NEXT, encode_cursor
+from posts.bulk import bulk_create_posts
+from posts.timeline import TIMELINE_KEY, TIMELINE_TIMEOUT
 
 User = get_user_model()
 
@@ -306,3 +315,123 @@ class PostViewsTest_create_post_not_in_group(TestCase):
         # совпадает с ожидаемым
         first_object = response.context['page_obj'][0]
         self.assertNotEqual(self.post, first_object)
+
+
+class KeysetPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth4')
+        cls.group = Group.objects.create(
+            title='Заголовок',
+            slug='test-slug4',
+            description='Тестовое описание'
+        )
+        for i in range(13):
+            Post.objects.create(
+                text=str(i) + '. Текст 1',
+                author=cls.user,
+                group=cls.group
+            )
+
+    def setUp(self):
+        # Страницы для анонимов кэшируются, а тестам нужен контекст
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсор next_cursor ведет на следующую страницу,
+        previous_cursor возвращает на первую"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug4'}),
+            reverse('posts:profile', kwargs={'username': 'auth4'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first_page = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    url, {'cursor': first_page.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                back_page = self.client.get(
+                    url, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_cursor_page_without_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        first_page = self.client.get(
+            reverse('posts:index')).context['page_obj']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:index'), {'cursor': first_page.next_cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу"""
+        response = self.client.get(reverse('posts:index'), {'cursor': '!!'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_with_huge_id_shows_first_page(self):
+        """Курсор с id больше 64 бит открывает первую страницу"""
+        cursor = encode_cursor(NEXT, timezone.now().isoformat(), 10 ** 30)
+        response = self.client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class TimelineIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth5')
+        for i in range(13):
+            Post.objects.create(text=str(i) + '. Текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_index_served_from_timeline(self):
+        """Главная из буфера: один запрос на страницу, а не поиск по ленте"""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(len(cache.get(TIMELINE_KEY)[1]), 13)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('posts:index'))
+        first_page = response.context['page_obj']
+        self.assertEqual(len(first_page), 10)
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('posts:index'), {'cursor': first_page.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_timeline_follows_writes(self):
+        """Новый пост попадает в начало буфера, удаленный пропадает"""
+        self.client.get(reverse('posts:index'))
+        new_post = Post.objects.create(text='Новый пост', author=self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        new_post.delete()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(new_post, list(response.context['page_obj']))
+
+    def test_writes_do_not_extend_timeline(self):
+        """Записи не продлевают буфер: через TIMELINE_TIMEOUT после
+        сборки он пересобирается и видит пост, прошедший мимо сигналов"""
+        built_at = 1000000.0
+        with mock.patch('time.time', return_value=built_at):
+            self.client.get(reverse('posts:index'))
+        with mock.patch(
+                'time.time', return_value=built_at + TIMELINE_TIMEOUT - 2):
+            Post.objects.create(text='Через сигнал', author=self.user)
+            bulk_create_posts(
+                [Post(text='Мимо сигналов', author=self.user)])
+        with mock.patch(
+                'time.time', return_value=built_at + TIMELINE_TIMEOUT + 1):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            response.context['page_obj'][0].text, 'Мимо сигналов')
@@ -0,0 +1,153 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import write_behind
+from posts.models import AuthorStats, Group, GroupStats, Post
+
+User = get_user_model()
+QUEUE_DIR = tempfile.mkdtemp()
+CACHE_DIR = tempfile.mkdtemp()
+# Воркер очереди требует кэш, общий для процессов
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+    }
+}
+
+
+@override_settings(
+    POST_WRITE_BEHIND=True, POST_QUEUE_DIR=QUEUE_DIR, CACHES=SHARED_CACHES)
+class WriteBehindTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='queued')
+        cls.group = Group.objects.create(
+            title='Группа', slug='queued', description='Описание')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        for path in (write_behind.get_queued_paths()
+                     + write_behind.get_failed_paths()):
+            os.remove(path)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, text, group=None):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': text, 'group': group.pk if group else ''},
+            follow=True,
+        )
+
+    def test_post_create_enqueues(self):
+        """post_create кладет пост в очередь, не трогая таблицу постов"""
+        response = self.create_post('Отложенный пост', self.group)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=['queued']))
+        self.assertContains(response, 'Пост принят')
+        self.assertFalse(Post.objects.exists())
+        self.assertEqual(write_behind.queue_length(), 1)
+
+    def test_drain_keeps_order_and_author(self):
+        """Воркер вставляет посты в порядке отправки от имени автора"""
+        for i in range(3):
+            self.create_post(f'Пост {i}', self.group if i else None)
+        call_command('drain_post_queue', '--batch-size=2', stdout=StringIO())
+        self.assertEqual(write_behind.queue_length(), 0)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Пост 2', 'Пост 1', 'Пост 0'])
+        self.assertEqual(
+            set(Post.objects.values_list('author', flat=True)),
+            {self.user.pk})
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 3)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).posts_count, 2)
+
+    def test_drain_is_idempotent(self):
+        """Повтор после сбоя до удаления файлов не дублирует посты"""
+        self.create_post('Единственный пост')
+        path, = write_behind.get_queued_paths()
+        with open(path, encoding='utf-8') as file:
+            content = file.read()
+        write_behind.drain()
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        self.assertEqual(write_behind.drain(), (0, 0))
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(write_behind.queue_length(), 0)
+
+    @override_settings(POST_WRITE_BEHIND=False)
+    def test_direct_mode(self):
+        """Без write-behind пост пишется сразу"""
+        self.create_post('Сразу в базу')
+        self.assertTrue(Post.objects.filter(text='Сразу в базу').exists())
+        self.assertEqual(write_behind.queue_length(), 0)
+
+    def test_rename_keeps_author(self):
+        """Смена имени до вставки не меняет автора поста"""
+        self.create_post('Пост до смены имени')
+        User.objects.filter(pk=self.user.pk).update(username='renamed')
+        write_behind.drain()
+        self.assertEqual(
+            Post.objects.get(text='Пост до смены имени').author_id,
+            self.user.pk)
+
+    def test_failed_record_goes_to_dead_letter(self):
+        """Пост удаленной группы уходит в FAILED_DIR с причиной,
+        остальные вставляются"""
+        group = Group.objects.create(
+            title='Удаляемая', slug='deleted', description='Описание')
+        self.create_post('Пост в удаленную группу', group)
+        self.create_post('Обычный пост')
+        group.delete()
+        err = StringIO()
+        call_command('drain_post_queue', stdout=StringIO(), stderr=err)
+        self.assertIn(write_behind.FAILED_DIR, err.getvalue())
+        self.assertEqual(write_behind.queue_length(), 0)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Обычный пост'])
+        path, = write_behind.get_failed_paths()
+        with open(path, encoding='utf-8') as file:
+            record = json.load(file)
+        self.assertEqual(record['text'], 'Пост в удаленную группу')
+        self.assertIn('нет группы', record['error'])
+
+    def test_drain_is_exclusive(self):
+        """Пока один воркер разбирает очередь, второй ждет"""
+        lock_path = os.path.join(QUEUE_DIR, write_behind.LOCK_NAME)
+        with write_behind.drain_lock():
+            with open(lock_path) as file:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with open(lock_path) as file:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def test_command_requires_shared_cache(self):
+        """С LocMemCache воркер не запускается: его сброс кэша
+        не дошел бы до процессов сервера"""
+        local = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local):
+            with self.assertRaises(CommandError):
+                call_command('drain_post_queue', stdout=StringIO())
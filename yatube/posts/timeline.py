@@ -0,0 +1,121 @@
+"""Кольцевой буфер id последних постов для главной страницы.
+
+Список хранится в кэше вместе со временем сборки и обновляется
+сигналами модели Post. Первые страницы главной собираются из него
+одним запросом id__in, более глубокие страницы читаются из базы.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from core.db_router import get_replica
+
+from .models import Post
+from .paginators import NEXT, KeysetPaginator
+
+TIMELINE_KEY = 'posts:timeline'
+TIMELINE_SIZE = 200
+# Буфер пересобирается хотя бы так часто, даже если запись прошла
+# мимо сигналов этого процесса. Срок считается от сборки: записи
+# его не продлевают
+TIMELINE_TIMEOUT = 60 * 10
+
+
+def rebuild_timeline():
+    # Буфер живет до следующей записи, поэтому собирается с основной
+    # базы, а не с реплики, которая может отставать
+    ids = list(
+        Post.objects.using(DEFAULT_DB_ALIAS).order_by('-pub_date', '-id')
+        .values_list('id', flat=True)[:TIMELINE_SIZE]
+    )
+    cache.set(TIMELINE_KEY, (time.time(), ids), TIMELINE_TIMEOUT)
+    return ids
+
+
+def get_timeline():
+    timeline = cache.get(TIMELINE_KEY)
+    if timeline is None:
+        return rebuild_timeline()
+    return timeline[1]
+
+
+def push_post(post_id):
+    """Кладет id нового поста в начало буфера.
+
+    Буфер сохраняется с оставшимся от сборки сроком. Если бы каждая
+    запись продлевала его, при постоянных записях он не пересобирался
+    бы никогда, и пост из другого процесса или потерянный в гонке
+    двух писателей так и не попал бы на главную."""
+    timeline = cache.get(TIMELINE_KEY)
+    if timeline is None:
+        # Буфер соберется заново при первом чтении
+        return
+    built_at, ids = timeline
+    remaining = int(built_at + TIMELINE_TIMEOUT - time.time())
+    if remaining < 1:
+        cache.delete(TIMELINE_KEY)
+        return
+    ids = [post_id] + [pk for pk in ids if pk != post_id]
+    cache.set(TIMELINE_KEY, (built_at, ids[:TIMELINE_SIZE]), remaining)
+
+
+def remove_post(post_id):
+    timeline = cache.get(TIMELINE_KEY)
+    if timeline is None or post_id not in timeline[1]:
+        return
+    # Буфер стал короче: проще пересобрать его из базы,
+    # чтобы в конец попал следующий по дате пост
+    cache.delete(TIMELINE_KEY)
+
+
+def invalidate_timeline():
+    cache.delete(TIMELINE_KEY)
+
+
+class TimelinePaginator(KeysetPaginator):
+    """KeysetPaginator для главной страницы, который берет
+    первые страницы из буфера и уходит в базу, если курсор
+    вышел за его пределы."""
+
+    def get_cursor_page(self, cursor=None):
+        page = self.get_timeline_page(cursor)
+        if page is None:
+            return super().get_cursor_page(cursor)
+        return page
+
+    def get_timeline_page(self, cursor=None):
+        direction, key = self.parse_cursor(cursor)
+        ids = get_timeline()
+        # Буфер неполон только тогда, когда в нем вся таблица
+        is_complete = len(ids) < TIMELINE_SIZE
+        if key is None:
+            start = 0
+        elif key[1] not in ids:
+            return None
+        elif direction == NEXT:
+            start = ids.index(key[1]) + 1
+        else:
+            start = max(0, ids.index(key[1]) - self.per_page)
+        if direction == NEXT or key is None:
+            window = ids[start:start + self.per_page + 1]
+            if len(window) <= self.per_page and not is_complete:
+                return None
+            page_ids = window[:self.per_page]
+            has_next = len(window) > self.per_page
+        else:
+            page_ids = ids[start:ids.index(key[1])]
+            has_next = True
+        posts = self.object_list.in_bulk(page_ids)
+        if len(posts) != len(page_ids):
+            # Реплика могла еще не получить новый пост: этот запрос
+            # читает ленту из базы, а буфер не трогаем. Промах на
+            # основной базе значит, что в буфере остался удаленный пост
+            if get_replica() is None:
+                invalidate_timeline()
+            return None
+        return self._get_keyset_page(
+            [posts[pk] for pk in page_ids],
+            has_next=has_next,
+            has_previous=start > 0,
+        )
@@ -1,11 +1,13 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 urlpatterns = [
     # Главная страница
     path('', views.index, name='index'),
+    # Каталог групп
+    path('groups/', views.group_index, name='groups'),
     # Посты, отфильтрованные по группам.
     path('group/<slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
@@ -13,4 +15,17 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
+    # Полнотекстовый поиск по постам
+    path('search/', views.search, name='search'),
+    # RSS и Atom ленты
+    path('rss/', feeds.index_rss, name='index_rss'),
+    path('atom/', feeds.index_atom, name='index_atom'),
+    path('group/<slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.profile_rss,
+         name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.profile_atom,
+         name='profile_atom'),
+    # Потоковая выгрузка постов для сотрудников
+    path('export/', views.export, name='export'),
 ]
@@ -1,17 +1,37 @@
+from functools import partial
+
 from django.shortcuts import redirect, render, get_object_or_404
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.http import urlencode
+from core.db_router import pin_primary, use_replica
+from .archive import ArchivePaginator, get_post_or_404
+from .export import CONTENT_TYPES, ExportError, export_posts
+from .export import get_export_querysets
 from .forms import PostForm
-from .models import Post, Group, User
-from django.core.paginator import Paginator
-
-TEN = 10
+from .models import ArchivedPost, Post, Group, User
+from .page_cache import (
+    cache_anonymous_page, conditional_page, group_scope, groups_scope,
+    index_scope, post_detail_scopes, profile_scope,
+    remember_post_author)
+from .paginators import get_page_obj
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
+from .write_behind import enqueue_post
 
 
+@conditional_page('posts:index', index_scope)
+@cache_anonymous_page('posts:index', index_scope)
+@use_replica
 def index(request):
     post_list = Post.objects.select_related('author', 'group')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, post_list, TimelinePaginator, index_scope())
     title = 'Последние обновления на сайте'
     context = {
         'page_obj': page_obj,
@@ -20,12 +40,16 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page('posts:group_list', group_scope)
+@cache_anonymous_page('posts:group_list', group_scope)
+@use_replica
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('group')
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = get_page_obj(request, posts, partial(
+        ArchivePaginator,
+        archived=group.archived_posts.select_related('author', 'group'),
+    ), group_scope(slug))
     title = f'Записи сообщества {group}'
     context = {
         'group': group,
@@ -37,12 +61,33 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page('posts:groups', groups_scope)
+@cache_anonymous_page('posts:groups', groups_scope)
+@use_replica
+def group_index(request):
+    """Каталог групп: сначала самые активные. Число постов и
+    последний пост берутся из GroupStats одним запросом."""
+    groups = Group.objects.select_related(
+        'stats__last_post__author',
+    ).order_by(
+        F('stats__last_pub_date').desc(nulls_last=True), 'title')
+    context = {
+        'groups': groups,
+    }
+    return render(request, 'posts/group_index.html', context)
+
+
+@conditional_page('posts:profile', profile_scope)
+@cache_anonymous_page('posts:profile', profile_scope)
+@use_replica
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('post_stats'), username=username)
     post_list = user.posts.select_related('author', 'group')
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(request, post_list, partial(
+        ArchivePaginator,
+        archived=user.archived_posts.select_related('author', 'group'),
+    ), profile_scope(username))
     context = {
         'author': user,
         'page_obj': page_obj,
@@ -50,23 +95,80 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@conditional_page('posts:post_detail', post_detail_scopes)
+@cache_anonymous_page('posts:post_detail', post_detail_scopes)
+@use_replica
 def post_detail(request, post_id):
     # Здесь код запроса к модели и создание словаря контекста
-    user_post = get_object_or_404(Post, id=post_id)
+    # Старые посты лежат в архиве под теми же id
+    user_post = get_post_or_404(
+        Post.objects.select_related('author__post_stats', 'group'),
+        ArchivedPost.objects.select_related('author__post_stats', 'group'),
+        post_id)
+    # Страница показывает число постов автора и зависит от его области
+    remember_post_author(user_post.pk, user_post.author_id)
     context = {
         'posts': user_post,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@use_replica
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = SearchPaginator(query).get_cursor_page(
+            request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export(request):
+    """Выгрузка постов для аналитики; фильтры author, group,
+    since и until берутся из строки запроса."""
+    file_format = request.GET.get('format', 'ndjson')
+    try:
+        posts, archived = get_export_querysets(
+            **{
+                key: request.GET.get(key)
+                for key in ('author', 'group', 'since', 'until')
+            })
+        rows = export_posts(posts, file_format, archived=archived)
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        rows, content_type=f'{CONTENT_TYPES[file_format]}; charset=utf-8')
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{file_format}"')
+    return response
+
+
 @login_required
+@pin_primary
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(request.POST)
         if form.is_valid():
+            if settings.POST_WRITE_BEHIND:
+                # Пост вставит drain_post_queue, запрос не ждет базу
+                enqueue_post(
+                    request.user, form.cleaned_data['text'],
+                    form.cleaned_data['group'])
+                messages.info(
+                    request, 'Пост принят и появится в ленте через '
+                    'несколько секунд.')
+                return redirect('posts:profile', request.user.username)
             new_post = form.save(commit=False)
             new_post.author_id = request.user.id
-            new_post.save()
+            # Пост и счетчики автора и группы сохраняются вместе
+            with transaction.atomic():
+                new_post.save()
             return redirect('posts:profile', request.user.username)
         return render(request, 'posts/create_post.html', {'form': form})
     form = PostForm()
@@ -74,9 +176,10 @@ def post_create(request):
 
 
 @login_required
+@pin_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
-    if request.user != post.author:
+    if request.user.id != post.author_id:
         return redirect('posts:post_detail', post_id=post.id)
     form = PostForm(request.POST or None, instance=post)
     context = {
@@ -86,6 +189,7 @@ def post_edit(request, post_id):
     if form.is_valid():
         form.author = request.user
         form = form.save(commit=False)
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post_detail', post_id=post.id)
     return render(request, 'posts/create_post.html', context)
@@ -0,0 +1,188 @@
+"""Отложенная запись новых постов (write-behind).
+
+При POST_WRITE_BEHIND = True представление post_create не пишет
+в базу, а кладет проверенные данные формы файлом в POST_QUEUE_DIR.
+Запись файла не ждет блокировок SQLite, поэтому авторы в пике не
+стоят в очереди. Команда drain_post_queue забирает файлы пачками
+и вставляет посты через bulk.import_posts.
+
+Автор и группа хранятся по id, а не по username и slug: смена имени
+между отправкой и вставкой не отдает пост другому автору. Имя файла
+начинается с времени в наносекундах, поэтому посты вставляются
+в порядке отправки, а pub_date берется из момента отправки, а не
+вставки. Файл удаляется только после коммита; если воркер упал
+между коммитом и удалением, при повторе уже вставленные посты
+узнаются по автору и pub_date и не дублируются. Два воркера
+не разбирают очередь одновременно: drain() берет файловую
+блокировку. Запись, которую нельзя вставить (автора или группу
+удалили), переезжает в подкаталог FAILED_DIR вместе с причиной.
+
+Воркер — отдельный процесс, поэтому буфер главной и кэш страниц он
+сбрасывает через общий кэш: с LocMemCache команда не запускается.
+"""
+import fcntl
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bulk
+from .models import Post
+
+QUEUE_SUFFIX = '.json'
+DRAIN_BATCH_SIZE = 500
+# Подкаталог POST_QUEUE_DIR для записей, которые не удалось вставить
+FAILED_DIR = 'failed'
+LOCK_NAME = '.drain.lock'
+
+
+def get_queue_dir():
+    path = settings.POST_QUEUE_DIR
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def get_failed_dir():
+    path = os.path.join(get_queue_dir(), FAILED_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_record(directory, name, record):
+    """Пишет запись файлом name в directory и возвращает путь.
+    Файл появляется целиком или не появляется вовсе."""
+    temporary = os.path.join(directory, f'.{name}.tmp')
+    path = os.path.join(directory, name)
+    with open(temporary, 'w', encoding='utf-8') as file:
+        json.dump(record, file, ensure_ascii=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+    return path
+
+
+def enqueue_post(author, text, group=None):
+    """Сохраняет пост в очередь и возвращает путь к файлу."""
+    record = {
+        'text': text,
+        'author_id': author.pk,
+        'group_id': group.pk if group else None,
+        'pub_date': timezone.now().isoformat(),
+    }
+    name = f'{time.time_ns():020d}-{uuid.uuid4().hex}{QUEUE_SUFFIX}'
+    return write_record(get_queue_dir(), name, record)
+
+
+def get_queued_paths(limit=None):
+    """Файлы очереди в порядке отправки постов."""
+    directory = get_queue_dir()
+    names = sorted(
+        name for name in os.listdir(directory)
+        if name.endswith(QUEUE_SUFFIX)
+    )
+    return [os.path.join(directory, name) for name in names[:limit]]
+
+
+def get_failed_paths():
+    directory = get_failed_dir()
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(QUEUE_SUFFIX)
+    )
+
+
+def queue_length():
+    return len(get_queued_paths())
+
+
+@contextmanager
+def drain_lock():
+    """Держит очередь за одним воркером: второй ждет, пока первый
+    не закончит пачку, и уже не увидит ее файлов."""
+    path = os.path.join(get_queue_dir(), LOCK_NAME)
+    with open(path, 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def move_to_failed(path, record, error):
+    """Переносит файл очереди в FAILED_DIR, дописав причину."""
+    name = os.path.basename(path)
+    if record is None:
+        # Файл не читается как JSON: переносим как есть
+        os.replace(path, os.path.join(get_failed_dir(), name))
+        return
+    write_record(get_failed_dir(), name, {**record, 'error': str(error)})
+    os.remove(path)
+
+
+def read_record(path):
+    with open(path, encoding='utf-8') as file:
+        record = json.load(file)
+    if not isinstance(record, dict):
+        raise ValueError('запись должна быть объектом JSON')
+    return record
+
+
+def skip_inserted(items):
+    """Убирает из пар (путь, запись) уже вставленные прошлым
+    запуском."""
+    dates = {}
+    for path, record in items:
+        try:
+            dates[path] = parse_datetime(record.get('pub_date') or '')
+        except (TypeError, ValueError):
+            # Битую дату отклонит import_posts
+            dates[path] = None
+    inserted = set(
+        Post.objects.filter(pub_date__in=set(dates.values()) - {None})
+        .values_list('author_id', 'pub_date')
+    )
+    return [
+        (path, record) for path, record in items
+        if not isinstance(record.get('author_id'), int)
+        or (record['author_id'], dates[path]) not in inserted
+    ]
+
+
+def drain(batch_size=DRAIN_BATCH_SIZE, on_error=None):
+    """Вставляет одну пачку постов из очереди. on_error(имя файла,
+    ошибка) вызывается для записей, ушедших в FAILED_DIR.
+    Возвращает (вставлено, пропущено)."""
+    with drain_lock():
+        paths = get_queued_paths(batch_size)
+        if not paths:
+            return 0, 0
+        items = []
+        skipped = 0
+        for path in paths:
+            try:
+                items.append((path, read_record(path)))
+            except ValueError as error:
+                skipped += 1
+                move_to_failed(path, None, error)
+                if on_error is not None:
+                    on_error(os.path.basename(path), error)
+        items = skip_inserted(items)
+
+        def report(number, error):
+            path, record = items[number - 1]
+            move_to_failed(path, record, error)
+            if on_error is not None:
+                on_error(os.path.basename(path), error)
+
+        created, rejected = bulk.import_posts(
+            [record for _, record in items], chunk_size=batch_size,
+            batch_size=batch_size, on_error=report)
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+    return created, skipped + rejected
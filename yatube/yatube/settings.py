@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,11 +50,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время запроса включало остальные middleware
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # AuthenticationMiddleware, который берет пользователя из кэша
+    'core.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -63,7 +68,9 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который замеряет рендеринг для core.metrics
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -84,12 +91,84 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.backends.sqlite3 включает WAL и ставит транзакции в очередь
+# на запись, см. docstring модуля. Соединение живет CONN_MAX_AGE секунд
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+    },
+    # Локальная заглушка реплики; данные в нее копирует sync_replicas
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+    },
+}
+
+# Ленты читаются с этих алиасов (core.db_router), запись всегда идет
+# в default. Пустой список — все запросы к default
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+# Сколько секунд автор после правки читает с default
+REPLICA_PIN_SECONDS = 10
+
+# Кэш хранит буфер последних постов главной страницы (posts.timeline)
+# и страницы лент для анонимов (posts.page_cache).
+# При нескольких процессах нужен общий backend, например memcached;
+# без него drain_post_queue не запускается
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# С общим кэшем сессия читается из кэша, а в базу только пишется.
+# Вместе с core.auth.CachedAuthenticationMiddleware авторизованный
+# запрос не читает из базы ни сессию, ни пользователя. С LocMemCache
+# выход сбросил бы сессию в кэше одного процесса, поэтому тогда
+# сессии читаются из базы (и middleware не кэширует пользователя)
+SESSION_ENGINE = (
+    'django.contrib.sessions.backends.db'
+    if CACHES['default']['BACKEND'].endswith('.LocMemCache')
+    else 'django.contrib.sessions.backends.cached_db'
+)
+
+# Сколько секунд хранить страницу ленты для анонимов; 0 выключает кэш
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+# post_create кладет новые посты в очередь-каталог, а в базу их
+# пачками вставляет команда drain_post_queue (posts.write_behind)
+POST_WRITE_BEHIND = False
+POST_QUEUE_DIR = os.path.join(BASE_DIR, 'post_queue')
+
+# Сколько SQL-запросов может выполнить страница для анонима без кэша
+# страниц (core.query_budget). Для авторизованного столько же, если кэш
+# общий: сессия и пользователь берутся из него. Число не зависит
+# от количества постов
+QUERY_BUDGETS = {
+    'posts:index': 1,
+    'posts:group_list': 2,
+    'posts:groups': 1,
+    'posts:profile': 2,
+    'posts:post_detail': 1,
+    'posts:search': 2,
+    'posts:post_create': 0,
+    'posts:post_edit': 1,
+}
+
+# Гистограммы запросов по представлениям (core.metrics), /metrics.
+# Процесс переносит замеры в общий кэш раз в METRICS_FLUSH_INTERVAL
+# секунд. Prometheus без входа в админку читает /metrics с заголовком
+# Authorization: Bearer METRICS_TOKEN; None — только сотрудникам
+METRICS_ENABLED = True
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Запросы дольше стольких секунд попадают в журнал вместе с планом
+# (core.slow_queries); отчет — команда slow_queries. None выключает
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.jsonl')
 
 
 # Password validation
@@ -130,6 +209,13 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+# collectstatic складывает сюда файлы с хешем в имени и их .gz,
+# а yatube.wsgi отдает их с Cache-Control на год (core.staticfiles)
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStaticFilesStorage'
+# Без manifest тег static падает, а не отдает имена без хеша.
+# При DEBUG (разработка, тесты) collectstatic не обязателен
+STATICFILES_MANIFEST_STRICT = not DEBUG
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # PASSWORD_RESET = 'users:password_reset_form'
@@ -17,6 +17,8 @@ from django.contrib import admin
 # импорт include позволит использовать адреса, включенные в приложения
 from django.urls import include, path
 
+from core import views as core_views
+
 urlpatterns = [
     # Сначала проверяем все пути, которые есть в приложении ice_cream
     path('', include('posts.urls', namespace='posts')),
@@ -24,4 +26,6 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('api/v1/', include('api.urls', namespace='api')),
+    path('metrics', core_views.metrics, name='metrics'),
 ]
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Статику из STATIC_ROOT (после collectstatic) отдаем до Django:
+# сжатые копии и Cache-Control на год для имен с хешем
+from core.staticfiles import PrecompressedStaticFiles  # noqa: E402
+
+application = PrecompressedStaticFiles(application)